@@ -0,0 +1,246 @@
+"""Admission control and load shedding for the FastAPI app.
+
+Requests are classified into three classes that share one event loop:
+
+* ``telephony`` – Twilio webhooks, which time out if they are slow. They get
+  the largest concurrency budget, no rate limit and briefly queue instead of
+  being rejected.
+* ``ui`` – dashboard pages, htmx partials and static files.
+* ``bulk`` – exports and trace downloads.
+
+``ui`` and ``bulk`` have their own concurrency and token-bucket rate limits
+and are additionally shed while telephony is busy, answering ``503`` with a
+``Retry-After`` header. Counters are exposed through :func:`stats` and the
+``/admission`` endpoint.
+
+Handlers that touch SQLite run in the threadpool, so the per-class limits
+bound threads rather than time spent blocking the loop. The pool is sized to
+fit every class at its limit, which keeps a full ``ui`` class from taking the
+threads webhooks need.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, MutableMapping
+
+from anyio.to_thread import current_default_thread_limiter
+
+from .config import settings
+
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
+
+TELEPHONY_PATHS = ("/voice", "/gather", "/status", "/agent-status")
+TELEPHONY_PREFIXES = ("/ivr/",)
+BULK_PREFIXES = ("/export/",)
+EXEMPT_PATHS = ("/admission",)
+
+
+def classify(path: str) -> str | None:
+    """Return the admission class for a request path (``None`` = exempt)."""
+
+    if path in EXEMPT_PATHS:
+        return None
+    if path in TELEPHONY_PATHS or path.startswith(TELEPHONY_PREFIXES):
+        return "telephony"
+    if path.startswith(BULK_PREFIXES) or (path.startswith("/traces/") and path.endswith("/otlp")):
+        return "bulk"
+    return "ui"
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.capacity = max(burst, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+@dataclass
+class ClassPolicy:
+    concurrency: int
+    rate: float | None = None
+    burst: float | None = None
+    queue_timeout: float = 0.0
+    # Shed this class while telephony in-flight reaches this share of its limit.
+    yield_to_telephony: float | None = None
+
+
+@dataclass
+class ClassState:
+    policy: ClassPolicy
+    semaphore: asyncio.Semaphore
+    bucket: TokenBucket | None
+    in_flight: int = 0
+    admitted: int = 0
+    shed: Dict[str, int] = field(default_factory=dict)
+
+
+def default_policies() -> Dict[str, ClassPolicy]:
+    return {
+        "telephony": ClassPolicy(
+            concurrency=settings.admission_telephony_concurrency,
+            queue_timeout=settings.admission_telephony_queue_timeout,
+        ),
+        "ui": ClassPolicy(
+            concurrency=settings.admission_ui_concurrency,
+            rate=settings.admission_ui_rate,
+            burst=settings.admission_ui_rate * 2,
+            yield_to_telephony=0.75,
+        ),
+        "bulk": ClassPolicy(
+            concurrency=settings.admission_bulk_concurrency,
+            rate=settings.admission_bulk_rate,
+            burst=settings.admission_bulk_concurrency,
+            yield_to_telephony=0.25,
+        ),
+    }
+
+
+class AdmissionController:
+    """Per-class concurrency/rate accounting shared by the middleware."""
+
+    def __init__(self, policies: Dict[str, ClassPolicy] | None = None) -> None:
+        self.policies = policies or default_policies()
+        self._states: Dict[str, ClassState] | None = None
+        self._pool_sized = False
+
+    @property
+    def states(self) -> Dict[str, ClassState]:
+        # Semaphores are created lazily so they bind to the serving loop.
+        if self._states is None:
+            self._states = {
+                name: ClassState(
+                    policy=policy,
+                    semaphore=asyncio.Semaphore(policy.concurrency),
+                    bucket=TokenBucket(policy.rate, policy.burst or policy.rate)
+                    if policy.rate
+                    else None,
+                )
+                for name, policy in self.policies.items()
+            }
+        return self._states
+
+    async def acquire(self, name: str) -> str | None:
+        """Take a slot for ``name``; return a shed reason if refused."""
+
+        if not self._pool_sized:
+            self._size_thread_pool()
+        state = self.states[name]
+        policy = state.policy
+        if policy.yield_to_telephony is not None:
+            telephony = self.states["telephony"]
+            if telephony.in_flight >= telephony.policy.concurrency * policy.yield_to_telephony:
+                return "telephony_busy"
+        if state.semaphore.locked():
+            if policy.queue_timeout <= 0:
+                return "concurrency"
+            try:
+                await asyncio.wait_for(state.semaphore.acquire(), policy.queue_timeout)
+            except asyncio.TimeoutError:
+                return "queue_timeout"
+        else:
+            await state.semaphore.acquire()
+        # Charge the rate limit only for requests that got a slot, so
+        # concurrency rejections do not also drain the bucket.
+        if state.bucket is not None and not state.bucket.take():
+            state.semaphore.release()
+            return "rate_limited"
+        state.in_flight += 1
+        state.admitted += 1
+        return None
+
+    def _size_thread_pool(self) -> None:
+        # The default limiter belongs to the serving loop, like the semaphores.
+        limiter = current_default_thread_limiter()
+        needed = sum(policy.concurrency for policy in self.policies.values())
+        limiter.total_tokens = max(limiter.total_tokens, needed)
+        self._pool_sized = True
+
+    def release(self, name: str) -> None:
+        state = self.states[name]
+        state.in_flight -= 1
+        state.semaphore.release()
+
+    def record_shed(self, name: str, reason: str) -> None:
+        shed = self.states[name].shed
+        shed[reason] = shed.get(reason, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            name: {
+                "in_flight": state.in_flight,
+                "admitted": state.admitted,
+                "shed": dict(state.shed),
+                "shed_total": sum(state.shed.values()),
+                "concurrency": state.policy.concurrency,
+                "rate": state.policy.rate,
+            }
+            for name, state in self.states.items()
+        }
+
+
+class AdmissionMiddleware:
+    """ASGI middleware holding a class slot for the whole response lifetime."""
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController | None = None) -> None:
+        self.app = app
+        self.controller = controller or admission
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.admission_enabled:
+            await self.app(scope, receive, send)
+            return
+        name = classify(scope["path"])
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+        reason = await self.controller.acquire(name)
+        if reason is not None:
+            self.controller.record_shed(name, reason)
+            await self._reject(send, reason)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(name)
+
+    async def _reject(self, send: Send, reason: str) -> None:
+        body = json.dumps({"error": "overloaded", "reason": reason}).encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("ascii")),
+                    (b"retry-after", str(settings.admission_retry_after).encode("ascii")),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+admission = AdmissionController()
+
+
+def stats() -> Dict[str, Any]:
+    return admission.stats()
+
+
+__all__ = ["AdmissionController", "AdmissionMiddleware", "admission", "classify", "stats"]
@@ -9,9 +9,14 @@ from typing import Callable, Protocol
 
 from .config import settings
 from .storage import storage
+from .tracing import tracer
+from .workqueue import DONE, FAILED, LEASED, LeaseKeeper, QueueBackend
 
 logger = logging.getLogger(__name__)
 
+# How often a pause between calls or claims checks for a stop request.
+STOP_POLL_SECONDS = 0.2
+
 
 class TelephonyClient(Protocol):
     """Protocol that outbound telephony backends must implement."""
@@ -51,6 +56,10 @@ def get_client() -> TelephonyClient:
         return TwilioClient()
     if settings.telephony_backend == "asterisk":
         return AsteriskClient()
+    if settings.telephony_backend == "simulated":
+        from .simulator import SimulatedClient
+
+        return SimulatedClient()
     raise ValueError(f"Unknown telephony backend: {settings.telephony_backend}")
 
 
@@ -70,8 +79,16 @@ ShouldStop = Callable[[], bool]
 class DialerRunner:
     """Coordinates sequential dialing with rate limiting."""
 
-    def __init__(self, client: TelephonyClient | None = None) -> None:
+    def __init__(
+        self,
+        client: TelephonyClient | None = None,
+        sleep: Callable[[float], None] | None = None,
+        interval: float | None = None,
+    ) -> None:
         self.client = client or get_client()
+        # Simulated clients run on a virtual clock and supply their own sleep.
+        self.sleep = sleep or getattr(self.client, "sleep", time.sleep)
+        self.interval = settings.dial_interval_seconds if interval is None else interval
 
     def run(
         self,
@@ -85,51 +102,164 @@ class DialerRunner:
             if should_stop and should_stop():
                 logger.info("Dialer stopped before calling %s", number)
                 break
-            if storage.is_dnc(number):
-                result = DialResult(
-                    number=number,
-                    call_sid="",
-                    status="skipped",
-                    skipped=True,
-                    reason="Number on DNC list",
-                )
-                storage.log_call_event(
-                    f"dnc-skip-{uuid.uuid4()}",
-                    number,
-                    "skipped",
-                    {"reason": result.reason},
-                )
-                if progress:
-                    progress(result)
+            result = self.dial(number, progress)
+            if result.skipped:
                 continue
+            if result.status != "error" and should_stop and should_stop():
+                logger.info("Dialer stop requested after calling %s", number)
+                break
+            self._pause(should_stop)
+        self._settle(should_stop)
 
-            try:
-                call_sid = self._place_call(number)
-            except Exception as exc:  # pragma: no cover - network failure path
-                logger.exception("Failed to place call to %s", number)
-                storage.log_call_event("error", number, "error", {"error": str(exc)})
-                if progress:
-                    progress(
-                        DialResult(
-                            number=number,
-                            call_sid="",
-                            status="error",
-                            reason=str(exc),
-                        )
-                    )
-                time.sleep(settings.dial_interval_seconds)
-                continue
+    def run_queue(
+        self,
+        backend: QueueBackend,
+        campaign: str,
+        worker: str | None = None,
+        progress: ProgressCallback | None = None,
+        should_stop: ShouldStop | None = None,
+    ) -> None:
+        """Dial numbers leased from a shared work queue until it is drained.
 
-            storage.log_call_event(call_sid, number, "initiated", {})
+        Several nodes can run this against the same campaign; each number is
+        dialed by whichever node holds its lease. Unfinished leases are
+        released on exit so another node can pick them up immediately.
+        """
+
+        try:
+            self._run_leases(backend, campaign, worker, progress, should_stop)
+        finally:
+            self._settle(should_stop)
+
+    def _run_leases(
+        self,
+        backend: QueueBackend,
+        campaign: str,
+        worker: str | None,
+        progress: ProgressCallback | None,
+        should_stop: ShouldStop | None,
+    ) -> None:
+        with LeaseKeeper(backend, campaign, worker) as keeper:
+            while not (should_stop and should_stop()):
+                leases = keeper.claim()
+                if not leases:
+                    if backend.counts(campaign).get(LEASED, 0):
+                        # Other nodes still hold leases; wait in case they expire.
+                        self._wait(max(keeper.lease_seconds / 3, 0.5), should_stop)
+                        continue
+                    return
+                # One batch lookup per claim also catches DNC and registry
+                # changes made after the numbers were enqueued.
+                _, blocked = storage.split_dnc([lease.number for lease in leases])
+                blocked_set = set(blocked)
+                for lease in leases:
+                    if should_stop and should_stop():
+                        logger.info("Dialer stopped before calling %s", lease.number)
+                        return
+                    if not keeper.holds(lease):
+                        continue
+                    if lease.number in blocked_set:
+                        self._skip_dnc(lease.number, progress)
+                        keeper.complete(lease, DONE)
+                        continue
+                    result = self.dial(lease.number, progress, check_dnc=False)
+                    keeper.complete(lease, FAILED if result.status == "error" else DONE)
+                    if result.skipped:
+                        continue
+                    if should_stop and should_stop():
+                        logger.info("Dialer stop requested after calling %s", lease.number)
+                        return
+                    self._pause(should_stop)
+
+    def dial(
+        self, number: str, progress: ProgressCallback | None = None, check_dnc: bool = True
+    ) -> DialResult:
+        """Place one call unless the number is on the DNC list.
+
+        Pass ``check_dnc=False`` when the caller already screened the number.
+        """
+
+        if check_dnc and storage.is_dnc(number):
+            return self._skip_dnc(number, progress)
+
+        started_ns = tracer.clock_ns()
+        try:
+            call_sid = self._place_call(number)
+        except Exception as exc:  # pragma: no cover - network failure path
+            logger.exception("Failed to place call to %s", number)
+            storage.log_call_event("error", number, "error", {"error": str(exc)})
+            result = DialResult(
+                number=number,
+                call_sid="",
+                status="error",
+                reason=str(exc),
+            )
             if progress:
-                progress(DialResult(number=number, call_sid=call_sid, status="initiated"))
-            if should_stop and should_stop():
-                logger.info("Dialer stop requested after calling %s", number)
-                break
-            time.sleep(settings.dial_interval_seconds)
+                progress(result)
+            return result
+
+        tracer.record(
+            "dial.place_call",
+            call_sid,
+            started_ns,
+            number=number,
+            backend=settings.telephony_backend,
+        )
+        with tracer.span("dial.log_initiated", call_sid):
+            storage.log_call_event(call_sid, number, "initiated", {})
+        result = DialResult(number=number, call_sid=call_sid, status="initiated")
+        if progress:
+            progress(result)
+        return result
+
+    def _skip_dnc(self, number: str, progress: ProgressCallback | None) -> DialResult:
+        result = DialResult(
+            number=number,
+            call_sid="",
+            status="skipped",
+            skipped=True,
+            reason="Number on DNC list",
+        )
+        storage.log_call_event(
+            f"dnc-skip-{uuid.uuid4()}",
+            number,
+            "skipped",
+            {"reason": result.reason},
+        )
+        if progress:
+            progress(result)
+        return result
+
+    def _pause(self, should_stop: ShouldStop | None) -> None:
+        self._wait(self.interval, should_stop)
+
+    def _wait(self, seconds: float, should_stop: ShouldStop | None) -> None:
+        """Sleep ``seconds``, returning early once a stop is requested.
+
+        The wait is sliced so a stop lands within about ``STOP_POLL_SECONDS``
+        of real time; simulated clients say how much virtual time that is.
+        """
+
+        if should_stop is None:
+            self.sleep(seconds)
+            return
+        if self.sleep is time.sleep:
+            step = STOP_POLL_SECONDS
+        else:
+            step = getattr(self.client, "stop_poll_seconds", seconds)
+        remaining = seconds
+        while remaining > 0 and not should_stop():
+            chunk = min(remaining, step)
+            self.sleep(chunk)
+            remaining -= chunk
+
+    def _settle(self, should_stop: ShouldStop | None) -> None:
+        settle = getattr(self.client, "settle", None)
+        if settle is not None:
+            settle(should_stop)
 
     def _place_call(self, number: str) -> str:
-        if settings.dry_run:
+        if settings.dry_run and not getattr(self.client, "simulated", False):
             fake_sid = f"dryrun-{uuid.uuid4()}"
             logger.info("Dry-run: pretending to call %s", number)
             return fake_sid
@@ -1,29 +1,50 @@
 """Terminal user interface for the dialer."""
 from __future__ import annotations
 
+import asyncio
 import sys
-import time
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Deque, List, Tuple
 
-from prompt_toolkit import HTML, PromptSession
+from prompt_toolkit.application import Application
+from prompt_toolkit.filters import Condition
+from prompt_toolkit.formatted_text import StyleAndTextTuples
+from prompt_toolkit.key_binding import KeyBindings, KeyPressEvent
+from prompt_toolkit.layout import ConditionalContainer, HSplit, Layout, VSplit, Window
+from prompt_toolkit.layout.controls import FormattedTextControl
 from prompt_toolkit.styles import Style
+from prompt_toolkit.widgets import Frame, TextArea
 
 from .calls import DialResult, DialerRunner
 from .config import settings
+from .numberset import CombinedNumberSet
 from .storage import storage
 from .utils import normalize_number
+from .workqueue import QueueBackend, get_backend, prepare_campaign
 
-MENU = HTML(
-    "<b>Harjun Raskaskone – Dialer v1</b>\n"
-    "1) Syötä puhelinnumerot\n"
-    "2) Soita puheluita\n"
-    "3) Näytä numerot\n"
-    "4) Lisää numero DNC-listalle\n"
-    "5) Tyhjennä numerolista\n"
-    "6) Asetukset\n"
-    "0) Poistu\n"
+PAGE_SIZE = 15
+EVENT_ROWS = 15
+PROGRESS_ROWS = 6
+POLL_INTERVAL_SECONDS = 1.0
+EXIT_WAIT_SECONDS = 5.0
+
+HELP = (
+    "a) lisää numero  x) lisää DNC  d) soita  s) pysäytä  c) tyhjennä lista  "
+    "tab) numerot/DNC  n/p) sivu  i) asetukset  q) poistu"
 )
 
-STYLE = Style.from_dict({"prompt": "ansicyan"})
+STYLE = Style.from_dict(
+    {
+        "prompt": "ansicyan",
+        "title": "bold ansicyan",
+        "dnc": "ansired",
+        "ok": "ansigreen",
+        "muted": "ansibrightblack",
+        "status": "reverse",
+    }
+)
 
 
 def mask(value: str, visible: int = 4) -> str:
@@ -32,109 +53,390 @@ def mask(value: str, visible: int = 4) -> str:
     return f"{'*' * (len(value) - visible)}{value[-visible:]}"
 
 
-def prompt_loop() -> None:
-    session = PromptSession(style=STYLE)
-
-    while True:
-        print(MENU)
-        choice = session.prompt(HTML("<prompt>Valinta: </prompt>"))
-        if choice == "1":
-            collect_numbers(session)
-        elif choice == "2":
-            run_dialer()
-        elif choice == "3":
-            show_numbers()
-        elif choice == "4":
-            add_dnc(session)
-        elif choice == "5":
-            confirm = session.prompt(HTML("<prompt>Tyhjennetäänkö lista? (y/n): </prompt>"))
-            if confirm.lower().startswith("y"):
-                storage.clear_numbers()
-                print("Numerolista tyhjennetty.")
-        elif choice == "6":
-            show_settings()
-        elif choice == "0":
-            print("Hei hei!")
-            return
-        else:
-            print("Tuntematon valinta.")
+def _signature(path: Path) -> Tuple[int, int]:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return (0, 0)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class DialerTUI:
+    """Full-screen dialer console with background dialing.
+
+    Dialing runs in a daemon thread and reports back to the event loop; the
+    number/DNC files are only re-read when they change, DNC markers for the
+    visible page are looked up in one batch and only that page is rendered.
+    """
+
+    def __init__(self) -> None:
+        self.numbers: List[str] = []
+        self.dnc: List[str] = []
+        self.dnc_index = CombinedNumberSet()
+        self.events: Deque = deque(maxlen=EVENT_ROWS)
+        self.results: Deque[DialResult] = deque(maxlen=PROGRESS_ROWS)
+        self.view = "numbers"
+        self.page = 0
+        self.mode: str | None = None
+        self.message = "Valmiina."
+        self.show_settings = False
+        self.dial_task: asyncio.Task | None = None
+        self._stop = threading.Event()
+        self._dial_thread: threading.Thread | None = None
+        self._numbers_sig: Tuple[int, int] | None = None
+        self._dnc_version: str | None = None
+        self._last_event_id = 0
+
+        self.input_field = TextArea(
+            height=1,
+            multiline=False,
+            prompt=self._input_prompt,
+            accept_handler=self._accept_input,
+        )
+        self.app = self._build_app()
+
+    # ------------------------------------------------------------------
+    # Layout
+    # ------------------------------------------------------------------
+    def _build_app(self) -> Application:
+        list_control = FormattedTextControl(self._render_list, focusable=True)
+        self._list_window = Window(list_control, height=PAGE_SIZE + 1)
+        body = VSplit(
+            [
+                Frame(self._list_window, title=self._list_title),
+                Frame(
+                    Window(FormattedTextControl(self._render_events), height=EVENT_ROWS),
+                    title="Viimeisimmät tapahtumat",
+                ),
+            ]
+        )
+        root = HSplit(
+            [
+                Window(FormattedTextControl(self._render_header), height=1),
+                body,
+                Frame(
+                    Window(FormattedTextControl(self._render_progress), height=PROGRESS_ROWS),
+                    title="Soiton tila",
+                ),
+                ConditionalContainer(
+                    Frame(Window(FormattedTextControl(self._render_settings)), title="Asetukset"),
+                    filter=Condition(lambda: self.show_settings),
+                ),
+                ConditionalContainer(
+                    self.input_field, filter=Condition(lambda: self.mode is not None)
+                ),
+                Window(FormattedTextControl(self._render_status), height=1, style="class:status"),
+            ]
+        )
+        return Application(
+            layout=Layout(root, focused_element=self._list_window),
+            key_bindings=self._bindings(),
+            style=STYLE,
+            full_screen=True,
+        )
+
+    def _bindings(self) -> KeyBindings:
+        kb = KeyBindings()
+        idle = Condition(lambda: self.mode is None)
+        typing = Condition(lambda: self.mode is not None)
+
+        @kb.add("q", filter=idle)
+        @kb.add("c-c")
+        def _quit(event: KeyPressEvent) -> None:
+            self._stop.set()
+            event.app.exit()
+
+        @kb.add("a", filter=idle)
+        def _add_number(event: KeyPressEvent) -> None:
+            self._enter_mode("number")
+
+        @kb.add("x", filter=idle)
+        def _add_dnc(event: KeyPressEvent) -> None:
+            self._enter_mode("dnc")
+
+        @kb.add("c", filter=idle)
+        def _clear(event: KeyPressEvent) -> None:
+            self._enter_mode("clear")
+
+        @kb.add("d", filter=idle)
+        def _dial(event: KeyPressEvent) -> None:
+            self.start_dialing()
+
+        @kb.add("s", filter=idle)
+        def _stop(event: KeyPressEvent) -> None:
+            self.stop_dialing()
+
+        @kb.add("tab", filter=idle)
+        def _toggle(event: KeyPressEvent) -> None:
+            self.view = "dnc" if self.view == "numbers" else "numbers"
+            self.page = 0
+
+        @kb.add("n", filter=idle)
+        @kb.add("pagedown", filter=idle)
+        def _next(event: KeyPressEvent) -> None:
+            self.page = min(self.page + 1, self._page_count() - 1)
+
+        @kb.add("p", filter=idle)
+        @kb.add("pageup", filter=idle)
+        def _prev(event: KeyPressEvent) -> None:
+            self.page = max(self.page - 1, 0)
+
+        @kb.add("i", filter=idle)
+        def _settings(event: KeyPressEvent) -> None:
+            self.show_settings = not self.show_settings
+
+        @kb.add("escape", filter=typing)
+        def _cancel(event: KeyPressEvent) -> None:
+            self._leave_mode("Peruttu.")
+
+        return kb
 
+    # ------------------------------------------------------------------
+    # Rendering
+    # ------------------------------------------------------------------
+    def _visible(self) -> List[str]:
+        return self.dnc if self.view == "dnc" else self.numbers
 
-def collect_numbers(session: PromptSession) -> None:
-    print("Syötä numeroita (kirjoita /done lopettaaksesi):")
-    while True:
-        raw = session.prompt(HTML("<prompt>Numero: </prompt>"))
-        if raw.strip().lower() == "/done":
-            break
+    def _page_count(self) -> int:
+        return max(1, -(-len(self._visible()) // PAGE_SIZE))
+
+    def _list_title(self) -> str:
+        name = "DNC-lista" if self.view == "dnc" else "Numerolista"
+        return f"{name} ({len(self._visible())}) – sivu {self.page + 1}/{self._page_count()}"
+
+    def _render_header(self) -> StyleAndTextTuples:
+        state = "Käynnissä" if self.dialing else "Valmiina"
+        return [
+            ("class:title", "Harjun Raskaskone – Dialer v1"),
+            ("", f"  ·  {state}"),
+            ("class:muted", "  ·  dry-run" if settings.dry_run else ""),
+        ]
+
+    def _render_list(self) -> StyleAndTextTuples:
+        items = self._visible()
+        if not items:
+            empty = "Ei estettyjä numeroita." if self.view == "dnc" else "Ei tallennettuja numeroita."
+            return [("class:muted", empty)]
+        start = self.page * PAGE_SIZE
+        page = items[start : start + PAGE_SIZE]
+        blocked = (
+            self.dnc_index.contains_many(page) if self.view == "numbers" else [False] * len(page)
+        )
+        lines: StyleAndTextTuples = []
+        for idx, (number, is_dnc) in enumerate(zip(page, blocked), start=start + 1):
+            lines.append(("", f"#{idx}: {number}"))
+            if is_dnc:
+                lines.append(("class:dnc", " (DNC)"))
+            lines.append(("", "\n"))
+        return lines
+
+    def _render_events(self) -> StyleAndTextTuples:
+        if not self.events:
+            return [("class:muted", "Ei tapahtumia vielä.")]
+        return [
+            ("", f"{row['ts'][11:19]}  {row['number']:<14} {row['event']}\n")
+            for row in self.events
+        ]
+
+    def _render_progress(self) -> StyleAndTextTuples:
+        if not self.results:
+            return [("class:muted", "Ei soittoja vielä.")]
+        lines: StyleAndTextTuples = []
+        for result in self.results:
+            if result.skipped:
+                lines.append(("class:dnc", f"[{result.number}] skipped ({result.reason})\n"))
+            elif result.status == "error":
+                lines.append(("class:dnc", f"[{result.number}] error ({result.reason})\n"))
+            else:
+                lines.append(("class:ok", f"[{result.number}] {result.status}\n"))
+        return lines
+
+    def _render_settings(self) -> StyleAndTextTuples:
+        rows = [
+            ("Twilio Account SID", mask(settings.twilio_account_sid)),
+            ("Twilio Number", settings.twilio_number),
+            ("Agent Number", settings.agent_number),
+            ("Public Base URL", settings.public_base_url),
+            ("Dial interval (s)", str(settings.dial_interval_seconds)),
+            ("Backend", settings.telephony_backend),
+            ("SQLite polku", str(settings.sqlite_path)),
+            ("Dry-run", str(settings.dry_run)),
+        ]
+        return [("", f"{label:<20} {value}\n") for label, value in rows]
+
+    def _render_status(self) -> StyleAndTextTuples:
+        return [("", f" {self.message}  |  {HELP}")]
+
+    # ------------------------------------------------------------------
+    # Input handling
+    # ------------------------------------------------------------------
+    def _input_prompt(self) -> StyleAndTextTuples:
+        prompts = {
+            "number": "Numero: ",
+            "dnc": "DNC-numero: ",
+            "clear": "Tyhjennetäänkö lista? (y/n): ",
+        }
+        return [("class:prompt", prompts.get(self.mode or "", ""))]
+
+    def _enter_mode(self, mode: str) -> None:
+        self.mode = mode
+        self.input_field.text = ""
+        self.app.layout.focus(self.input_field)
+
+    def _leave_mode(self, message: str) -> None:
+        self.mode = None
+        self.message = message
+        self.app.layout.focus(self._list_window)
+
+    def _accept_input(self, buffer) -> bool:
+        raw = buffer.text.strip()
+        mode = self.mode
+        if mode == "clear":
+            if raw.lower().startswith("y"):
+                storage.clear_numbers()
+                get_backend().reset(settings.campaign)
+                self._leave_mode("Numerolista tyhjennetty.")
+            else:
+                self._leave_mode("Peruttu.")
+            self.reload()
+            return False
+        if not raw:
+            self._leave_mode("Valmiina.")
+            return False
         try:
             normalized = normalize_number(raw)
         except Exception as exc:  # pragma: no cover - validation feedback
-            print(f"Virhe: {exc}")
-            continue
-        storage.append_numbers([normalized])
-        storage.log_input(normalized, "tui")
-        print(f"Tallennettu {normalized}")
+            self.message = f"Virhe: {exc}"
+            return False
+        if mode == "number":
+            storage.append_numbers([normalized])
+            storage.log_input(normalized, "tui")
+            self.message = f"Tallennettu {normalized}"
+        else:
+            storage.add_to_dnc(normalized)
+            self.message = f"Lisättiin {normalized} DNC-listalle."
+        self.reload()
+        return False
 
+    # ------------------------------------------------------------------
+    # Data refresh
+    # ------------------------------------------------------------------
+    def reload(self) -> None:
+        """Pick up file and event changes without re-reading unchanged data."""
 
-def run_dialer() -> None:
-    numbers = storage.list_numbers()
-    if not numbers:
-        print("Numerolista on tyhjä.")
-        return
+        numbers_sig = _signature(storage.numbers_file)
+        if numbers_sig != self._numbers_sig:
+            self.numbers = storage.list_numbers()
+            self._numbers_sig = numbers_sig
+            self.page = min(self.page, self._page_count() - 1)
+        dnc_version = storage.dnc_version()
+        if dnc_version != self._dnc_version:
+            self.dnc = storage.list_dnc()
+            self.dnc_index = storage.dnc_index()
+            self._dnc_version = dnc_version
+        new_events = storage.events_after(self._last_event_id, EVENT_ROWS)
+        if new_events:
+            self._last_event_id = new_events[0]["id"]
+            for row in reversed(new_events):
+                self.events.appendleft(row)
 
-    runner = DialerRunner()
+    async def _poll(self) -> None:
+        while True:
+            self.reload()
+            self.app.invalidate()
+            await asyncio.sleep(POLL_INTERVAL_SECONDS)
 
-    def progress(result: DialResult) -> None:
-        status = result.status
-        if result.skipped:
-            status = f"skipped ({result.reason})"
-        print(f"[{result.number}] {status}")
+    # ------------------------------------------------------------------
+    # Dialing
+    # ------------------------------------------------------------------
+    @property
+    def dialing(self) -> bool:
+        return self.dial_task is not None and not self.dial_task.done()
 
-    print("Aloitetaan sarjasoitto. Keskeytä Ctrl+C.")
-    try:
-        runner.run(numbers, progress=progress)
-    except KeyboardInterrupt:  # pragma: no cover - user interaction
-        print("Soitto keskeytetty.")
-    finally:
-        time.sleep(0.5)
+    def start_dialing(self) -> None:
+        if self.dialing:
+            self.message = "Soitto on jo käynnissä."
+            return
+        numbers = storage.list_numbers()
+        if not numbers:
+            self.message = "Numerolista on tyhjä."
+            return
+        queue = get_backend()
+        if not prepare_campaign(queue, settings.campaign, numbers):
+            self.message = f"Kampanja {settings.campaign} on jo soitettu."
+            return
+        self._stop.clear()
+        self.results.clear()
+        self.message = "Aloitetaan sarjasoitto."
+        self.dial_task = self.app.create_background_task(self._dial(queue))
 
+    def stop_dialing(self) -> None:
+        if self.dialing:
+            self._stop.set()
+            self.message = "Pysäytetään seuraavan soiton jälkeen..."
 
-def show_numbers() -> None:
-    numbers = storage.list_numbers()
-    if not numbers:
-        print("Ei tallennettuja numeroita.")
-        return
-    for idx, number in enumerate(numbers, start=1):
-        marker = " (DNC)" if storage.is_dnc(number) else ""
-        print(f"#{idx}: {number}{marker}")
+    async def _dial(self, queue: QueueBackend) -> None:
+        loop = asyncio.get_running_loop()
+        done: asyncio.Future = loop.create_future()
+        runner = DialerRunner()
 
+        def progress(result: DialResult) -> None:
+            loop.call_soon_threadsafe(self._on_progress, result)
 
-def add_dnc(session: PromptSession) -> None:
-    raw = session.prompt(HTML("<prompt>DNC-numero: </prompt>"))
-    try:
-        normalized = normalize_number(raw)
-    except Exception as exc:  # pragma: no cover
-        print(f"Virhe: {exc}")
-        return
-    storage.add_to_dnc(normalized)
-    print(f"Lisättiin {normalized} DNC-listalle.")
-
-
-def show_settings() -> None:
-    print("Asetukset:")
-    print(f"  Twilio Account SID: {mask(settings.twilio_account_sid)}")
-    print(f"  Twilio Number: {settings.twilio_number}")
-    print(f"  Agent Number: {settings.agent_number}")
-    print(f"  Public Base URL: {settings.public_base_url}")
-    print(f"  Dial interval (s): {settings.dial_interval_seconds}")
-    print(f"  Backend: {settings.telephony_backend}")
-    print(f"  SQLite polku: {settings.sqlite_path}")
-    print(f"  Dry-run: {settings.dry_run}")
+        def target() -> None:
+            try:
+                runner.run_queue(
+                    queue, settings.campaign, progress=progress, should_stop=self._stop.is_set
+                )
+            except Exception as exc:  # pragma: no cover - surfaced in status bar
+                loop.call_soon_threadsafe(_finish, exc)
+            else:
+                loop.call_soon_threadsafe(_finish, None)
+
+        def _finish(exc: Exception | None) -> None:
+            if not done.done():
+                done.set_result(exc)
+
+        # Daemon thread so a call stuck in the backend cannot hold the exit
+        # past ``EXIT_WAIT_SECONDS``; see ``wait_for_dialer``.
+        self._dial_thread = threading.Thread(target=target, daemon=True)
+        self._dial_thread.start()
+        exc = await done
+        self.message = f"Virhe: {exc}" if exc else "Sarjasoitto päättyi."
+        self.app.invalidate()
+
+    def wait_for_dialer(self, timeout: float = EXIT_WAIT_SECONDS) -> bool:
+        """Stop dialing and give the runner thread time to release its leases.
+
+        Returns False if the thread is still running after ``timeout``.
+        """
+        self._stop.set()
+        thread = self._dial_thread
+        if thread is None:
+            return True
+        thread.join(timeout)
+        return not thread.is_alive()
+
+    def _on_progress(self, result: DialResult) -> None:
+        self.results.appendleft(result)
+        self.app.invalidate()
+
+    # ------------------------------------------------------------------
+    # Entry
+    # ------------------------------------------------------------------
+    async def run(self) -> None:
+        self.reload()
+        poller = asyncio.create_task(self._poll())
+        try:
+            await self.app.run_async()
+        finally:
+            poller.cancel()
+            self.wait_for_dialer()
 
 
 def main() -> None:  # pragma: no cover - CLI entrypoint
     try:
-        prompt_loop()
+        asyncio.run(DialerTUI().run())
     except KeyboardInterrupt:
         print("\nSuljetaan...")
         sys.exit(0)
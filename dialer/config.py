@@ -19,12 +19,37 @@ class DialerSettings(BaseSettings):
     agent_number: str = Field(..., env="AGENT_NUMBER")
     public_base_url: str = Field(..., env="PUBLIC_BASE_URL")
     dial_interval_seconds: int = Field(10, env="DIAL_INTERVAL_SECONDS")
-    telephony_backend: Literal["twilio", "asterisk"] = Field(
+    telephony_backend: Literal["twilio", "asterisk", "simulated"] = Field(
         "twilio", env="TELEPHONY_BACKEND"
     )
     sqlite_path: Path = Field(Path("./dialer/logs.sqlite"), env="SQLITE_PATH")
     data_dir: Path = Field(Path("./dialer"), env="DIALER_DATA_DIR")
     dry_run: bool = Field(False, env="DIALER_DRY_RUN")
+    simulation_speed: float = Field(1.0, env="SIMULATION_SPEED")
+    simulation_agents: int = Field(5, env="SIMULATION_AGENTS")
+    simulation_data_dir: Path | None = Field(None, env="SIMULATION_DATA_DIR")
+    trace_sample_rate: float = Field(0.1, env="TRACE_SAMPLE_RATE")
+    trace_db_path: Path | None = Field(None, env="TRACE_DB_PATH")
+    trace_retention_days: float = Field(7.0, env="TRACE_RETENTION_DAYS")
+    trace_max_spans: int = Field(1_000_000, env="TRACE_MAX_SPANS")
+    dnc_registry_path: Path | None = Field(None, env="DNC_REGISTRY_PATH")
+    campaign: str = Field("default", env="DIALER_CAMPAIGN")
+    node_id: str | None = Field(None, env="DIALER_NODE_ID")
+    queue_backend: Literal["sqlite", "redis"] = Field("sqlite", env="QUEUE_BACKEND")
+    redis_url: str = Field("redis://localhost:6379/0", env="REDIS_URL")
+    queue_lease_seconds: float = Field(60.0, env="QUEUE_LEASE_SECONDS")
+    queue_claim_batch: int = Field(5, env="QUEUE_CLAIM_BATCH")
+    ivr_flow_path: Path = Field(
+        Path(__file__).parent / "ivr_flow.json", env="IVR_FLOW_PATH"
+    )
+    admission_enabled: bool = Field(True, env="ADMISSION_ENABLED")
+    admission_telephony_concurrency: int = Field(64, env="ADMISSION_TELEPHONY_CONCURRENCY")
+    admission_telephony_queue_timeout: float = Field(2.0, env="ADMISSION_TELEPHONY_QUEUE_TIMEOUT")
+    admission_ui_concurrency: int = Field(16, env="ADMISSION_UI_CONCURRENCY")
+    admission_ui_rate: float = Field(20.0, env="ADMISSION_UI_RATE")
+    admission_bulk_concurrency: int = Field(2, env="ADMISSION_BULK_CONCURRENCY")
+    admission_bulk_rate: float = Field(0.5, env="ADMISSION_BULK_RATE")
+    admission_retry_after: int = Field(5, env="ADMISSION_RETRY_AFTER")
 
     class Config:
         env_file = ".env"
@@ -49,6 +74,43 @@ class DialerSettings(BaseSettings):
             path = Path.cwd() / path
         return path
 
+    @validator("ivr_flow_path", pre=True)
+    def _expand_ivr_flow_path(cls, value: str | os.PathLike[str]) -> Path:  # noqa: D401
+        """Ensure IVR flow path is absolute."""
+
+        path = Path(str(value)).expanduser()
+        if not path.is_absolute():
+            path = Path.cwd() / path
+        return path
+
+    @validator("trace_db_path", pre=True, always=True)
+    def _default_trace_db_path(
+        cls, value: str | os.PathLike[str] | None, values: dict
+    ) -> Path:  # noqa: D401
+        """Keep spans next to the audit log unless configured otherwise."""
+
+        if not value:
+            sqlite_path = values.get("sqlite_path") or Path.cwd() / "dialer" / "logs.sqlite"
+            return sqlite_path.parent / "traces.sqlite"
+        path = Path(str(value)).expanduser()
+        if not path.is_absolute():
+            path = Path.cwd() / path
+        return path
+
+    @validator("simulation_data_dir", pre=True, always=True)
+    def _default_simulation_data_dir(  # noqa: D401
+        cls, value: str | os.PathLike[str] | None, values: dict
+    ) -> Path:
+        """Keep simulated logs, DNC and traces apart from the live ones."""
+
+        if not value:
+            data_dir = values.get("data_dir") or Path.cwd() / "dialer"
+            return data_dir / "simulation"
+        path = Path(str(value)).expanduser()
+        if not path.is_absolute():
+            path = Path.cwd() / path
+        return path
+
 
 @lru_cache(maxsize=1)
 def get_settings() -> DialerSettings:
@@ -0,0 +1,138 @@
+"""Streaming CSV/JSONL exports of the SQLite audit logs."""
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import sys
+from typing import Callable, Iterable, Iterator
+
+from .storage import EXPORT_TABLES, storage
+
+FORMATS = ("csv", "jsonl")
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "jsonl": "application/x-ndjson"}
+
+
+def _csv_lines(columns: tuple[str, ...], rows: Iterable) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> str:
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return value
+
+    writer.writerow(columns)
+    yield flush()
+    for row in rows:
+        writer.writerow([row[column] for column in columns])
+        yield flush()
+
+
+def _jsonl_lines(columns: tuple[str, ...], rows: Iterable) -> Iterator[str]:
+    for row in rows:
+        record = {column: row[column] for column in columns}
+        payload = record.get("payload_json")
+        if payload:
+            try:
+                record["payload"] = json.loads(payload)
+                del record["payload_json"]
+            except ValueError:
+                pass
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+_WRITERS: dict[str, Callable[[tuple[str, ...], Iterable], Iterator[str]]] = {
+    "csv": _csv_lines,
+    "jsonl": _jsonl_lines,
+}
+
+
+def stream_export(
+    table: str,
+    fmt: str = "csv",
+    *,
+    since: str | None = None,
+    until: str | None = None,
+    number: str | None = None,
+    event: str | None = None,
+    chunk_size: int = 500,
+    batch_bytes: int = 64 * 1024,
+) -> Iterator[str]:
+    """Yield an export of ``table`` as text blocks of roughly ``batch_bytes``.
+
+    Rows are read in keyset chunks, so memory use stays flat no matter how
+    large the table grows. Validation happens eagerly so callers can turn a
+    bad table/format/filter into an error before the response starts.
+    """
+
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Unknown table: {table}")
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unknown format: {fmt}")
+
+    rows = storage.iter_rows(
+        table,
+        since=since,
+        until=until,
+        number=number,
+        event=event,
+        chunk_size=chunk_size,
+    )
+    return _batched(_WRITERS[fmt](EXPORT_TABLES[table], rows), batch_bytes)
+
+
+def _batched(lines: Iterator[str], batch_bytes: int) -> Iterator[str]:
+    parts: list[str] = []
+    size = 0
+    for line in lines:
+        parts.append(line)
+        size += len(line)
+        if size >= batch_bytes:
+            yield "".join(parts)
+            parts = []
+            size = 0
+    if parts:
+        yield "".join(parts)
+
+
+def main(argv: list[str] | None = None) -> int:  # pragma: no cover - CLI entrypoint
+    parser = argparse.ArgumentParser(description="Export dialer audit logs.")
+    parser.add_argument("table", choices=sorted(EXPORT_TABLES))
+    parser.add_argument("--format", dest="fmt", choices=FORMATS, default="csv")
+    parser.add_argument("--since", help="ISO timestamp (inclusive, UTC)")
+    parser.add_argument("--until", help="ISO timestamp (inclusive, UTC)")
+    parser.add_argument("--number", help="E.164 number")
+    parser.add_argument("--event", help="call_events.event or consents.action")
+    parser.add_argument("--output", "-o", help="Output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    try:
+        chunks = stream_export(
+            args.table,
+            args.fmt,
+            since=args.since,
+            until=args.until,
+            number=args.number,
+            event=args.event,
+        )
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+    else:
+        for chunk in chunks:
+            sys.stdout.write(chunk)
+    return 0
+
+
+__all__ = ["FORMATS", "MEDIA_TYPES", "stream_export"]
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,439 @@
+"""Data-driven IVR flows compiled into a cached state machine.
+
+A flow file (JSON, or YAML when PyYAML is installed) describes nodes::
+
+    {
+      "language": "fi-FI", "voice": "Polly.Veera", "start": "intro",
+      "nodes": {
+        "intro": {
+          "say": "...", "gather": {"num_digits": 1, "timeout": 10},
+          "retries": 2, "retry_say": "...",
+          "options": {"1": {"actions": [{"type": "consent", "action": "accepted"}],
+                            "next": "connect"}},
+          "on_invalid": "invalid", "on_timeout": "invalid"
+        },
+        "connect": {"say": "...", "dial": "agent"},
+        "invalid": {"say": "...", "hangup": true}
+      }
+    }
+
+A node either gathers DTMF (``gather`` + ``options``) or ends in exactly one
+of ``dial`` (``"agent"`` or an E.164 number), ``hangup`` or ``next``.
+Actions are ``consent`` (logs ``action``), ``dnc`` (adds the caller to the
+DNC list) and ``event`` (logs a call event named ``event``).
+
+Loading validates the whole file and pre-renders the TwiML for every node and
+retry attempt, so a webhook only looks up a string. Gather callbacks carry the
+flow version in their URL and :class:`FlowManager` keeps recent versions, so
+calls that are mid-menu when the file is hot-reloaded finish on the flow they
+started with.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+from urllib.parse import urlencode
+
+from twilio.twiml.voice_response import VoiceResponse
+
+from .config import settings
+from .storage import storage
+from .tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+VALID_DIGITS = set("0123456789*#")
+NODE_KEYS = {
+    "say",
+    "gather",
+    "retries",
+    "retry_say",
+    "options",
+    "on_invalid",
+    "on_timeout",
+    "dial",
+    "hangup",
+    "next",
+}
+ACTION_TYPES = {"consent": ("action",), "dnc": (), "event": ("event",)}
+GATHER_DEFAULTS = {"num_digits": 1, "timeout": 10}
+
+
+class FlowError(ValueError):
+    """Raised when a flow definition is invalid."""
+
+
+@dataclass(frozen=True)
+class Option:
+    actions: Tuple[Dict[str, str], ...]
+    next: str
+
+
+@dataclass(frozen=True)
+class CompiledNode:
+    name: str
+    twiml: Tuple[str, ...]
+    options: Dict[str, Option]
+    retries: int
+    on_invalid: str | None
+    on_timeout: str | None
+
+
+@dataclass(frozen=True)
+class CompiledFlow:
+    version: str
+    start: str
+    nodes: Dict[str, CompiledNode]
+
+    def entry(self, node: str | None = None) -> str:
+        """Return the pre-rendered TwiML for entering ``node`` (default: start)."""
+
+        return self.nodes[node or self.start].twiml[0]
+
+    def handle_input(
+        self, node_name: str, digits: str, attempt: int, caller: str, call_sid: str = ""
+    ) -> str:
+        """Apply a gather result to ``node_name`` and return the next TwiML."""
+
+        node = self.nodes.get(node_name) or self.nodes[self.start]
+        option = node.options.get(digits) if digits else None
+        if option is not None:
+            for action in option.actions:
+                _run_action(action, caller, call_sid, node.name)
+            return self.nodes[option.next].twiml[0]
+        if attempt < node.retries:
+            return node.twiml[attempt + 1]
+        target = node.on_invalid if digits else node.on_timeout
+        if target is None:
+            # Without an explicit target a failed gather ends the call.
+            response = VoiceResponse()
+            response.hangup()
+            return str(response)
+        return self.nodes[target].twiml[0]
+
+
+def _run_action(action: Dict[str, str], caller: str, call_sid: str, node: str) -> None:
+    kind = action["type"]
+    if kind == "consent":
+        storage.log_consent(caller, action["action"], "ivr")
+    elif kind == "dnc":
+        if caller:
+            storage.add_to_dnc(caller)
+    elif kind == "event":
+        storage.log_call_event(call_sid or "ivr", caller, action["event"], {"node": node})
+
+
+# ----------------------------------------------------------------------
+# Loading and validation
+# ----------------------------------------------------------------------
+def load_definition(path: Path) -> Tuple[Dict[str, Any], str]:
+    """Read a flow file and return ``(definition, content_hash)``."""
+
+    raw = path.read_bytes()
+    if path.suffix.lower() in {".yaml", ".yml"}:
+        try:
+            import yaml  # optional dependency, only needed for YAML flows
+        except ImportError as exc:  # pragma: no cover - depends on environment
+            raise FlowError("YAML flows require PyYAML (pip install pyyaml)") from exc
+        try:
+            definition = yaml.safe_load(raw)
+        except yaml.YAMLError as exc:
+            raise FlowError(f"Invalid YAML: {exc}") from exc
+    else:
+        try:
+            definition = json.loads(raw)
+        except ValueError as exc:
+            raise FlowError(f"Invalid JSON: {exc}") from exc
+    return definition, hashlib.sha1(raw).hexdigest()[:10]
+
+
+def validate(definition: Any) -> None:
+    """Raise :class:`FlowError` listing every problem in ``definition``."""
+
+    errors: List[str] = []
+    if not isinstance(definition, dict):
+        raise FlowError("Flow must be a mapping")
+    nodes = definition.get("nodes")
+    if not isinstance(nodes, dict) or not nodes:
+        raise FlowError("Flow must define a non-empty 'nodes' mapping")
+    start = definition.get("start")
+    if not isinstance(start, str) or start not in nodes:
+        errors.append(f"start node {start!r} is not defined")
+
+    def check_ref(name: str, field: str, target: Any) -> None:
+        if not isinstance(target, str) or target not in nodes:
+            errors.append(f"{name}.{field}: unknown node {target!r}")
+
+    for name, node in nodes.items():
+        if not isinstance(node, dict):
+            errors.append(f"{name}: node must be a mapping")
+            continue
+        unknown = set(node) - NODE_KEYS
+        if unknown:
+            errors.append(f"{name}: unknown keys {sorted(unknown)}")
+        for field in ("say", "retry_say", "dial"):
+            if field in node and not isinstance(node[field], str):
+                errors.append(f"{name}.{field} must be a string")
+        endings = [key for key in ("dial", "hangup", "next") if node.get(key)]
+        if "gather" in node:
+            if endings:
+                errors.append(f"{name}: gather nodes cannot also use {endings}")
+            gather = node["gather"]
+            num_digits = GATHER_DEFAULTS["num_digits"]
+            if not isinstance(gather, dict):
+                errors.append(f"{name}.gather must be a mapping")
+            else:
+                unknown = set(gather) - set(GATHER_DEFAULTS)
+                if unknown:
+                    errors.append(f"{name}.gather: unknown keys {sorted(unknown)}")
+                for field in GATHER_DEFAULTS:
+                    value = gather.get(field, GATHER_DEFAULTS[field])
+                    if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+                        errors.append(f"{name}.gather.{field} must be a positive integer")
+                    elif field == "num_digits":
+                        num_digits = value
+            options = node.get("options")
+            if not isinstance(options, dict) or not options:
+                errors.append(f"{name}: gather nodes need 'options'")
+                options = {}
+            for digits, option in options.items():
+                if not digits or not set(str(digits)) <= VALID_DIGITS:
+                    errors.append(f"{name}.options: invalid digits {digits!r}")
+                elif len(str(digits)) > num_digits:
+                    # Twilio stops collecting after num_digits, so this never matches.
+                    errors.append(
+                        f"{name}.options: {digits!r} is longer than gather.num_digits ({num_digits})"
+                    )
+                if not isinstance(option, dict):
+                    errors.append(f"{name}.options[{digits}] must be a mapping")
+                    continue
+                check_ref(name, f"options[{digits}].next", option.get("next"))
+                actions = option.get("actions", [])
+                if not isinstance(actions, list):
+                    errors.append(f"{name}.options[{digits}].actions must be a list")
+                    continue
+                for action in actions:
+                    kind = action.get("type") if isinstance(action, dict) else None
+                    if kind not in ACTION_TYPES:
+                        errors.append(f"{name}.options[{digits}]: unknown action {action!r}")
+                        continue
+                    for required in ACTION_TYPES[kind]:
+                        if not action.get(required):
+                            errors.append(f"{name}.options[{digits}]: {kind} needs {required!r}")
+            retries = node.get("retries", 0)
+            if not isinstance(retries, int) or isinstance(retries, bool) or retries < 0:
+                errors.append(f"{name}.retries must be a non-negative integer")
+            for field in ("on_invalid", "on_timeout"):
+                if node.get(field) is not None:
+                    check_ref(name, field, node[field])
+        else:
+            if len(endings) != 1:
+                errors.append(f"{name}: needs exactly one of gather, dial, hangup or next")
+            if node.get("next"):
+                check_ref(name, "next", node["next"])
+    errors.extend(_next_cycles(nodes))
+    if errors:
+        raise FlowError("; ".join(errors))
+
+
+def _next_cycles(nodes: Dict[str, Any]) -> List[str]:
+    """Report loops made only of ``next`` redirects, which never wait for input."""
+
+    def successor(name: str) -> str | None:
+        node = nodes.get(name)
+        if not isinstance(node, dict) or "gather" in node:
+            return None
+        target = node.get("next")
+        return target if isinstance(target, str) and target in nodes else None
+
+    errors = []
+    finished: set = set()
+    for start in nodes:
+        path: List[str] = []
+        current: str | None = start
+        while current is not None and current not in finished and current not in path:
+            path.append(current)
+            current = successor(current)
+        if current is not None and current in path:
+            loop = path[path.index(current):] + [current]
+            errors.append(f"next redirects loop forever: {' -> '.join(loop)}")
+        finished.update(path)
+    return errors
+
+
+# ----------------------------------------------------------------------
+# Compilation
+# ----------------------------------------------------------------------
+def node_url(node: str, version: str, **params: Any) -> str:
+    query = urlencode({"v": version, **params})
+    return f"{settings.public_base_url}/ivr/{node}?{query}"
+
+
+def compile_flow(definition: Dict[str, Any], version: str) -> CompiledFlow:
+    validate(definition)
+    language = definition.get("language", "fi-FI")
+    voice = definition.get("voice", "Polly.Veera")
+    compiled: Dict[str, CompiledNode] = {}
+    for name, node in definition["nodes"].items():
+        retries = node.get("retries", 0) if "gather" in node else 0
+        twiml = tuple(
+            _render(name, node, attempt, version, language, voice)
+            for attempt in range(retries + 1)
+        )
+        options = {
+            str(digits): Option(actions=tuple(option.get("actions", [])), next=option["next"])
+            for digits, option in node.get("options", {}).items()
+        }
+        compiled[name] = CompiledNode(
+            name=name,
+            twiml=twiml,
+            options=options,
+            retries=retries,
+            on_invalid=node.get("on_invalid"),
+            on_timeout=node.get("on_timeout"),
+        )
+    return CompiledFlow(version=version, start=definition["start"], nodes=compiled)
+
+
+def _render(
+    name: str, node: Dict[str, Any], attempt: int, version: str, language: str, voice: str
+) -> str:
+    response = VoiceResponse()
+    if "gather" in node:
+        gather_opts = node["gather"]
+        callback = node_url(name, version, attempt=attempt, input=1)
+        gather = response.gather(
+            num_digits=gather_opts.get("num_digits", GATHER_DEFAULTS["num_digits"]),
+            action=callback,
+            method="POST",
+            timeout=gather_opts.get("timeout", GATHER_DEFAULTS["timeout"]),
+            input="dtmf",
+            language=language,
+        )
+        if attempt and node.get("retry_say"):
+            gather.say(node["retry_say"], language=language, voice=voice)
+        if node.get("say"):
+            gather.say(node["say"], language=language, voice=voice)
+        # Reached only when the gather times out without input.
+        response.redirect(callback, method="POST")
+        return str(response)
+
+    if node.get("say"):
+        response.say(node["say"], language=language, voice=voice)
+    if node.get("dial"):
+        target = settings.agent_number if node["dial"] == "agent" else node["dial"]
+        dial = response.dial(callerId=settings.twilio_number)
+        dial.number(
+            target,
+            status_callback=f"{settings.public_base_url}/agent-status",
+            status_callback_event="initiated ringing answered completed",
+        )
+    elif node.get("next"):
+        response.redirect(node_url(node["next"], version), method="POST")
+    else:
+        response.hangup()
+    return str(response)
+
+
+# ----------------------------------------------------------------------
+# Hot reload
+# ----------------------------------------------------------------------
+class FlowManager:
+    """Owns the active flow, reloading it when the file changes on disk."""
+
+    def __init__(self, path: Path, check_interval: float = 1.0, keep_versions: int = 5) -> None:
+        self.path = path
+        self.check_interval = check_interval
+        self.keep_versions = keep_versions
+        self._versions: "OrderedDict[str, CompiledFlow]" = OrderedDict()
+        self._current: CompiledFlow | None = None
+        self._mtime_ns = -1
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> CompiledFlow:
+        now = time.monotonic()
+        if self._current is None or now - self._checked >= self.check_interval:
+            self._maybe_reload(now)
+        if self._current is None:  # pragma: no cover - first load failed
+            raise FlowError(f"No valid IVR flow loaded from {self.path}")
+        return self._current
+
+    def get(self, version: str | None) -> CompiledFlow:
+        """Return the flow an in-flight call started on, or the current one."""
+
+        current = self.current()
+        if version and version != current.version:
+            return self._versions.get(version, current)
+        return current
+
+    def _maybe_reload(self, now: float) -> None:
+        with self._lock:
+            self._checked = now
+            try:
+                mtime_ns = self.path.stat().st_mtime_ns
+            except OSError as exc:
+                logger.error("IVR flow file %s is unreadable: %s", self.path, exc)
+                return
+            if mtime_ns == self._mtime_ns and self._current is not None:
+                return
+            self._mtime_ns = mtime_ns
+            try:
+                definition, version = load_definition(self.path)
+                flow = self._versions.get(version) or compile_flow(definition, version)
+            except Exception as exc:  # noqa: BLE001 - any bad edit keeps the old flow
+                # Keep serving the previous flow; a bad edit must not drop calls.
+                logger.error("Invalid IVR flow %s: %s", self.path, exc)
+                if self._current is None:
+                    raise
+                return
+            self._versions[version] = flow
+            self._versions.move_to_end(version)
+            while len(self._versions) > self.keep_versions:
+                self._versions.popitem(last=False)
+            if self._current is None or self._current.version != version:
+                logger.info("Loaded IVR flow %s (version %s)", self.path, version)
+            self._current = flow
+
+
+flows = FlowManager(settings.ivr_flow_path)
+
+
+def handle_node(
+    node: str,
+    version: str | None,
+    attempt: int,
+    is_input: bool,
+    digits: str,
+    caller: str,
+    call_sid: str = "",
+) -> str:
+    """Serve the generic ``/ivr/{node}`` webhook."""
+
+    flow = flows.get(version)
+    if node not in flow.nodes:
+        logger.warning("Unknown IVR node %s in flow %s", node, flow.version)
+        return flow.entry()
+    if not is_input:
+        return flow.entry(node)
+    with tracer.span("ivr.handle_input", node=node, digits=digits, attempt=attempt):
+        return flow.handle_input(node, digits, attempt, caller, call_sid)
+
+
+__all__ = [
+    "CompiledFlow",
+    "FlowError",
+    "FlowManager",
+    "compile_flow",
+    "flows",
+    "handle_node",
+    "load_definition",
+    "validate",
+]
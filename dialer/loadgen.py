@@ -0,0 +1,282 @@
+"""Local Twilio stand-in that load-tests the webhook endpoints.
+
+Each simulated call walks the same lifecycle Twilio drives against
+``dialer.server``: status callbacks for initiated → ringing → answered, the
+``/voice`` TwiML fetch, then the IVR itself by following the ``Gather
+action`` (keypress) or ``Redirect`` (timeout) URLs in each returned TwiML
+document, and a final ``completed`` status.
+
+Calls are started open-loop at a target rate: each one is scheduled against
+the run's start time and never waits for earlier calls. At most
+``concurrency`` calls are in flight; calls beyond that queue, and the queueing
+delay is reported alongside end-to-end call latency measured from the
+scheduled start, so an overloaded server cannot hide behind a slower offered
+rate (coordinated omission). Per-endpoint rows show service latency.
+
+    python -m dialer.loadgen --base-url http://127.0.0.1:8000 --calls 500 \\
+        --concurrency 50 --rate 20
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List
+from urllib.parse import urlsplit
+
+import httpx
+
+# "" lets the gather time out, "9" is not a menu option.
+DIGIT_WEIGHTS = {"1": 0.3, "2": 0.55, "9": 0.1, "": 0.05}
+# Upper bound on IVR steps per call, in case a flow loops.
+MAX_IVR_STEPS = 20
+
+
+@dataclass
+class LoadConfig:
+    base_url: str = "http://127.0.0.1:8000"
+    calls: int = 100
+    concurrency: int = 20
+    rate: float = 10.0
+    answer_ratio: float = 0.7
+    think_time: float = 0.0
+    timeout: float = 15.0
+    from_number: str = "+358401234567"
+
+
+@dataclass
+class EndpointStats:
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    statuses: Dict[int, int] = field(default_factory=lambda: defaultdict(int))
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies)
+
+    def percentile(self, pct: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+
+class LoadGenerator:
+    """Drives simulated call lifecycles against a running dialer server."""
+
+    def __init__(self, config: LoadConfig, rng: random.Random | None = None) -> None:
+        self.config = config
+        self.rng = rng or random.Random()
+        self.stats: Dict[str, EndpointStats] = defaultdict(EndpointStats)
+        self.queue_delay = EndpointStats()
+        self.call_latency = EndpointStats()
+        self.calls_completed = 0
+        self.calls_failed = 0
+        self.elapsed = 0.0
+
+    async def run(self) -> None:
+        limits = httpx.Limits(
+            max_connections=self.config.concurrency,
+            max_keepalive_connections=self.config.concurrency,
+        )
+        semaphore = asyncio.Semaphore(self.config.concurrency)
+        interval = 1.0 / self.config.rate if self.config.rate > 0 else 0.0
+        async with httpx.AsyncClient(
+            base_url=self.config.base_url, timeout=self.config.timeout, limits=limits
+        ) as client:
+            started = time.perf_counter()
+            tasks = []
+            for index in range(self.config.calls):
+                # Open-loop pacing: start each call at its scheduled time no
+                # matter how many are still in flight.
+                scheduled = started + index * interval
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(self._scheduled_call(client, semaphore, scheduled)))
+            await asyncio.gather(*tasks)
+            self.elapsed = time.perf_counter() - started
+
+    async def _scheduled_call(
+        self, client: httpx.AsyncClient, semaphore: asyncio.Semaphore, scheduled: float
+    ) -> None:
+        async with semaphore:
+            self.queue_delay.latencies.append(time.perf_counter() - scheduled)
+            await self._call(client)
+        self.call_latency.latencies.append(time.perf_counter() - scheduled)
+
+    async def _call(self, client: httpx.AsyncClient) -> None:
+        call_sid = f"CA{uuid.uuid4().hex}"
+        to_number = f"+35840{self.rng.randrange(10**6, 10**7)}"
+        base = {
+            "CallSid": call_sid,
+            "AccountSid": "ACloadgen",
+            "From": self.config.from_number,
+            "To": to_number,
+            "Direction": "outbound-api",
+        }
+        ok = await self._post(client, "/status", {**base, "CallStatus": "initiated"}) is not None
+        ok &= await self._post(client, "/status", {**base, "CallStatus": "ringing"}) is not None
+        if self.rng.random() >= self.config.answer_ratio:
+            outcome = self.rng.choice(["busy", "no-answer"])
+            ok &= await self._post(client, "/status", {**base, "CallStatus": outcome}) is not None
+        else:
+            ok &= await self._post(client, "/status", {**base, "CallStatus": "in-progress"}) is not None
+            twiml = await self._post(client, "/voice", {**base, "CallStatus": "in-progress"})
+            # Twilio reports the callee as From on the gather callback.
+            gather = {**base, "From": to_number, "To": self.config.from_number}
+            ok &= twiml is not None and await self._walk_ivr(client, twiml, gather)
+            ok &= await self._post(
+                client,
+                "/status",
+                {**base, "CallStatus": "completed", "CallDuration": "30"},
+            ) is not None
+        if ok:
+            self.calls_completed += 1
+        else:
+            self.calls_failed += 1
+
+    async def _walk_ivr(self, client: httpx.AsyncClient, twiml: str, form: dict) -> bool:
+        """Follow the TwiML returned by the server like Twilio would."""
+
+        for _ in range(MAX_IVR_STEPS):
+            try:
+                root = ET.fromstring(twiml)
+            except ET.ParseError:
+                self.stats["(twiml)"].errors += 1
+                return False
+            gather = root.find("Gather")
+            redirect = root.find("Redirect")
+            if gather is not None:
+                await self._think()
+                digits = self._choose_digit()
+                if digits:
+                    url = gather.get("action", "")
+                else:
+                    url = redirect.text if redirect is not None else ""
+                data = {**form, "Digits": digits} if digits else form
+            elif redirect is not None:
+                url, data = redirect.text or "", form
+            else:
+                # Dial, Hangup or plain Say: nothing more to request.
+                return True
+            if not url:
+                return True
+            parts = urlsplit(url)
+            # Callback URLs carry PUBLIC_BASE_URL; send them to the target server.
+            path = f"{parts.path}?{parts.query}" if parts.query else parts.path
+            response = await self._post(client, path, data, label=parts.path)
+            if response is None:
+                return False
+            twiml = response
+        return True
+
+    async def _post(
+        self, client: httpx.AsyncClient, path: str, data: dict, label: str | None = None
+    ) -> str | None:
+        """POST ``data`` and return the body, or ``None`` on failure."""
+
+        stats = self.stats[label or path]
+        started = time.perf_counter()
+        try:
+            response = await client.post(path, data=data)
+        except httpx.HTTPError:
+            stats.latencies.append(time.perf_counter() - started)
+            stats.errors += 1
+            return None
+        stats.latencies.append(time.perf_counter() - started)
+        stats.statuses[response.status_code] += 1
+        if response.status_code >= 400:
+            stats.errors += 1
+            return None
+        return response.text
+
+    async def _think(self) -> None:
+        if self.config.think_time > 0:
+            await asyncio.sleep(self.rng.uniform(0, self.config.think_time))
+
+    def _choose_digit(self) -> str:
+        digits = list(DIGIT_WEIGHTS)
+        return self.rng.choices(digits, weights=[DIGIT_WEIGHTS[d] for d in digits])[0]
+
+    def report(self) -> str:
+        total_requests = sum(s.requests for s in self.stats.values())
+        total_errors = sum(s.errors for s in self.stats.values())
+        elapsed = self.elapsed or 1e-9
+        lines = [
+            f"Calls: {self.calls_completed} ok, {self.calls_failed} failed in {self.elapsed:.2f}s "
+            f"({(self.calls_completed + self.calls_failed) / elapsed:.1f} calls/s)",
+            f"Requests: {total_requests} ({total_requests / elapsed:.1f} req/s), "
+            f"errors {total_errors} ({100 * total_errors / max(total_requests, 1):.2f}%)",
+            "",
+            f"{'endpoint':<16}{'reqs':>8}{'err%':>8}{'p50 ms':>10}{'p90 ms':>10}"
+            f"{'p99 ms':>10}{'max ms':>10}  statuses",
+        ]
+        rows = [
+            *sorted(self.stats.items()),
+            ("(queued)", self.queue_delay),
+            ("(call)", self.call_latency),
+        ]
+        for path, stats in rows:
+            statuses = ", ".join(f"{code}×{count}" for code, count in sorted(stats.statuses.items()))
+            lines.append(
+                f"{path:<16}{stats.requests:>8}"
+                f"{100 * stats.errors / max(stats.requests, 1):>8.2f}"
+                f"{stats.percentile(50) * 1000:>10.1f}"
+                f"{stats.percentile(90) * 1000:>10.1f}"
+                f"{stats.percentile(99) * 1000:>10.1f}"
+                f"{max(stats.latencies, default=0) * 1000:>10.1f}  {statuses}"
+            )
+        lines.append(
+            "(queued) = wait for a concurrency slot after the scheduled start; "
+            "(call) = scheduled start to last response."
+        )
+        return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:  # pragma: no cover - CLI entrypoint
+    parser = argparse.ArgumentParser(description="Load-test dialer webhooks like Twilio would.")
+    parser.add_argument("--base-url", default=LoadConfig.base_url)
+    parser.add_argument("--calls", type=int, default=LoadConfig.calls)
+    parser.add_argument("--concurrency", type=int, default=LoadConfig.concurrency)
+    parser.add_argument(
+        "--rate", type=float, default=LoadConfig.rate, help="new calls per second (0 = unpaced)"
+    )
+    parser.add_argument("--answer-ratio", type=float, default=LoadConfig.answer_ratio)
+    parser.add_argument(
+        "--think-time",
+        type=float,
+        default=LoadConfig.think_time,
+        help="max seconds between IVR steps",
+    )
+    parser.add_argument("--timeout", type=float, default=LoadConfig.timeout)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    config = LoadConfig(
+        base_url=args.base_url.rstrip("/"),
+        calls=args.calls,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        answer_ratio=args.answer_ratio,
+        think_time=args.think_time,
+        timeout=args.timeout,
+    )
+    generator = LoadGenerator(config, random.Random(args.seed))
+    asyncio.run(generator.run())
+    print(generator.report())
+    return 0 if generator.calls_failed == 0 else 1
+
+
+__all__ = ["LoadConfig", "LoadGenerator"]
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,242 @@
+"""Compact integer-backed sets of E.164 numbers.
+
+An E.164 number is at most 15 digits, so ``+358401234567`` is stored as the
+int64 ``358401234567``. A :class:`NumberSet` keeps those values sorted and
+unique in an ``array('q')`` (8 bytes per entry instead of a 60–80 byte
+``str`` in a ``set``) or in a memory-mapped binary file, so a national DNC
+registry of millions of entries can be shared by every worker through the
+page cache. Membership is a binary search; bulk lookups are vectorised with
+NumPy when it is installed.
+
+Binary files are an 8-byte magic header followed by little-endian int64
+values in ascending order::
+
+    python -m dialer.numberset compile registry.txt dnc_registry.bin
+"""
+from __future__ import annotations
+
+import argparse
+import heapq
+import itertools
+import mmap
+import sys
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Iterable, Iterator, List, Sequence
+
+try:  # optional, only used to vectorise bulk operations
+    import numpy as _np
+except ImportError:  # pragma: no cover - depends on environment
+    _np = None
+
+MAGIC = b"E164SET1"
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def to_int(number: str) -> int:
+    """Encode an E.164 string (``+`` and up to 15 digits) as an integer."""
+
+    digits = number[1:] if number.startswith("+") else ""
+    if not digits.isdigit() or len(digits) > 15 or digits[0] == "0":
+        raise ValueError(f"Not an E.164 number: {number!r}")
+    return int(digits)
+
+
+def to_str(value: int) -> str:
+    return f"+{value}"
+
+
+def _sorted_unique(values: Iterable[int], chunk: int = 1 << 16) -> array:
+    """Sort and de-duplicate ``values`` into an ``array('q')``.
+
+    Values are sorted in runs of ``chunk`` and the runs merged, so only one
+    run at a time exists as Python ints; peak memory stays near two int64
+    arrays instead of a ``set`` of the whole input.
+    """
+
+    iterator = iter(values)
+    runs = []
+    while True:
+        run = sorted(itertools.islice(iterator, chunk))
+        if not run:
+            break
+        runs.append(array("q", run))
+    if all(left[-1] <= right[0] for left, right in zip(runs, runs[1:])):
+        # Already ordered input (e.g. a sorted dnc.json) needs no merge.
+        merged = itertools.chain(*runs)
+    else:
+        merged = heapq.merge(*runs)
+    return array("q", (value for value, _ in itertools.groupby(merged)))
+
+
+def _encode_iter(numbers: Iterable[str]) -> Iterator[int]:
+    for number in numbers:
+        try:
+            yield to_int(number)
+        except ValueError:
+            # Anything that is not E.164 can never match a stored entry.
+            yield -1
+
+
+def _encode_many(numbers: Iterable[str]) -> List[int]:
+    return list(_encode_iter(numbers))
+
+
+class NumberSet:
+    """Immutable sorted set of E.164 numbers backed by int64 values."""
+
+    def __init__(self, values: Sequence[int] | None = None) -> None:
+        # ``values`` must already be sorted and unique; use the constructors.
+        self._values = values if values is not None else array("q")
+
+    # ------------------------------------------------------------------
+    # Constructors
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_numbers(cls, numbers: Iterable[str], strict: bool = True) -> "NumberSet":
+        """Build a set from E.164 strings; ``strict=False`` skips bad entries."""
+
+        if strict:
+            return cls.from_ints(to_int(number) for number in numbers)
+        return cls.from_ints(value for value in _encode_iter(numbers) if value >= 0)
+
+    @classmethod
+    def from_ints(cls, values: Iterable[int]) -> "NumberSet":
+        if _np is not None:
+            arr = _np.fromiter(values, dtype=_np.int64)
+            return cls(array("q", _np.unique(arr).tobytes()))
+        return cls(_sorted_unique(values))
+
+    @classmethod
+    def load(cls, path: Path) -> "NumberSet":
+        """Memory-map a binary set file written by :meth:`save`."""
+
+        with path.open("rb") as fh:
+            if fh.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a number set file")
+            if path.stat().st_size == len(MAGIC):
+                return cls()
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)[len(MAGIC):]
+        if _LITTLE_ENDIAN:
+            return cls(view.cast("q"))
+        values = array("q", view.tobytes())  # pragma: no cover - big-endian hosts
+        values.byteswap()  # pragma: no cover
+        return cls(values)  # pragma: no cover
+
+    def save(self, path: Path) -> None:
+        values = array("q", self._values)
+        if not _LITTLE_ENDIAN:  # pragma: no cover - big-endian hosts
+            values.byteswap()
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with tmp.open("wb") as fh:
+            fh.write(MAGIC)
+            values.tofile(fh)
+        tmp.replace(path)
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __iter__(self) -> Iterator[str]:
+        return (to_str(value) for value in self._values)
+
+    def __contains__(self, number: object) -> bool:
+        if isinstance(number, str):
+            try:
+                value = to_int(number)
+            except ValueError:
+                return False
+        elif isinstance(number, int):
+            value = number
+        else:
+            return False
+        values = self._values
+        index = bisect_left(values, value)
+        return index < len(values) and values[index] == value
+
+    def contains_many(self, numbers: Sequence[str]) -> List[bool]:
+        """Return membership flags for ``numbers`` in one pass."""
+
+        queries = _encode_many(numbers)
+        if not queries or not len(self._values):
+            return [False] * len(queries)
+        if _np is not None:
+            haystack = self._array()
+            needles = _np.asarray(queries, dtype=_np.int64)
+            index = _np.searchsorted(haystack, needles)
+            index[index == len(haystack)] = 0
+            return (haystack[index] == needles).tolist()
+        values = self._values
+        size = len(values)
+        flags = []
+        for value in queries:
+            index = bisect_left(values, value)
+            flags.append(index < size and values[index] == value)
+        return flags
+
+    def _array(self):
+        if not len(self._values):
+            return _np.empty(0, _np.int64)
+        return _np.frombuffer(self._values, dtype=_np.int64)
+
+
+class CombinedNumberSet:
+    """Read-only membership view over several sets without merging them."""
+
+    def __init__(self, *sets: NumberSet) -> None:
+        self.sets = [number_set for number_set in sets if len(number_set)]
+
+    def __len__(self) -> int:
+        return sum(len(number_set) for number_set in self.sets)
+
+    def __contains__(self, number: object) -> bool:
+        return any(number in number_set for number_set in self.sets)
+
+    def contains_many(self, numbers: Sequence[str]) -> List[bool]:
+        flags = [False] * len(numbers)
+        for number_set in self.sets:
+            flags = [a or b for a, b in zip(flags, number_set.contains_many(numbers))]
+        return flags
+
+
+def _read_numbers(path: Path) -> Iterator[str]:
+    from .utils import normalize_number
+
+    with path.open("r", encoding="utf-8") as fh:
+        for line in fh:
+            raw = line.strip().strip('",[]')
+            if not raw or raw.startswith("#"):
+                continue
+            raw = raw.split(",")[0].strip().strip('"')
+            if raw.startswith("+") and raw[1:].isdigit():
+                yield raw
+                continue
+            try:
+                yield normalize_number(raw)
+            except Exception:  # noqa: BLE001 - skip malformed registry lines
+                continue
+
+
+def main(argv: list[str] | None = None) -> int:  # pragma: no cover - CLI entrypoint
+    parser = argparse.ArgumentParser(description="Build compact binary number sets.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    compile_cmd = sub.add_parser("compile", help="Text/CSV/JSON list → binary set")
+    compile_cmd.add_argument("source", type=Path)
+    compile_cmd.add_argument("output", type=Path)
+    args = parser.parse_args(argv)
+
+    number_set = NumberSet.from_numbers(_read_numbers(args.source))
+    number_set.save(args.output)
+    print(f"Wrote {len(number_set)} numbers to {args.output}")
+    return 0
+
+
+__all__ = ["CombinedNumberSet", "NumberSet", "to_int", "to_str"]
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
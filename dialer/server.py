@@ -6,35 +6,55 @@ from pathlib import Path
 from typing import Any, Dict
 
 from fastapi import FastAPI, Form, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse, PlainTextResponse
-from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
-from .ivr import handle_selection, initial_prompt
-from .storage import storage
+from .admission import AdmissionMiddleware
+from .admission import stats as admission_stats
+from . import webhooks
+from .webui.assets import HTMLCompressionMiddleware
+from .webui.assets import router as static_router
 from .webui.routes import configure_templates, router
 
 logger = logging.getLogger("dialer.server")
 
 app = FastAPI(title="Harjun Raskaskone Dialer")
+app.add_middleware(HTMLCompressionMiddleware)
+app.add_middleware(AdmissionMiddleware)
 
 _templates_path = Path(__file__).parent / "webui" / "templates"
 templates = Jinja2Templates(directory=str(_templates_path))
-_static_path = Path(__file__).parent / "webui" / "static"
-app.mount("/static", StaticFiles(directory=str(_static_path)), name="static")
+app.include_router(static_router)
 
 configure_templates(templates)
 app.include_router(router)
 
 
 @app.post("/voice", response_class=PlainTextResponse)
-async def voice_webhook() -> PlainTextResponse:
-    return PlainTextResponse(initial_prompt(), media_type="application/xml")
+def voice_webhook(CallSid: str = Form("")) -> PlainTextResponse:  # noqa: N803
+    return PlainTextResponse(webhooks.voice(CallSid), media_type="application/xml")
 
 
 @app.post("/gather", response_class=PlainTextResponse)
-async def gather_webhook(Digits: str = Form(""), From: str = Form("")) -> PlainTextResponse:  # noqa: N803
-    twiml = handle_selection(Digits, From)
+def gather_webhook(
+    Digits: str = Form(""), From: str = Form(""), CallSid: str = Form("")  # noqa: N803
+) -> PlainTextResponse:
+    twiml = webhooks.gather(Digits, From, CallSid)
+    return PlainTextResponse(twiml, media_type="application/xml")
+
+
+@app.post("/ivr/{node}", response_class=PlainTextResponse)
+def ivr_webhook(
+    node: str,
+    v: str | None = None,
+    attempt: int = 0,
+    input: int = 0,  # noqa: A002 - query parameter set in compiled TwiML
+    Digits: str = Form(""),  # noqa: N803
+    From: str = Form(""),  # noqa: N803
+    CallSid: str = Form(""),  # noqa: N803
+) -> PlainTextResponse:
+    twiml = webhooks.ivr(node, v, attempt, bool(input), Digits, From, CallSid)
     return PlainTextResponse(twiml, media_type="application/xml")
 
 
@@ -46,13 +66,23 @@ async def status_webhook(request: Request) -> JSONResponse:
     else:
         form = await request.form()
         payload = dict(form)
-    call_sid = payload.get("CallSid", "unknown")
-    number = payload.get("To", "")
-    event = payload.get("CallStatus", payload.get("CallEvent", "unknown"))
-    storage.log_call_event(call_sid, number, event, payload)
+    # Form parsing is async; the SQLite writes run off the event loop.
+    await run_in_threadpool(webhooks.status, payload)
+    return JSONResponse({"ok": True})
+
+
+@app.post("/agent-status")
+async def agent_status_webhook(request: Request) -> JSONResponse:
+    form = await request.form()
+    await run_in_threadpool(webhooks.agent_status, dict(form))
     return JSONResponse({"ok": True})
 
 
+@app.get("/admission")
+async def admission_status() -> JSONResponse:
+    return JSONResponse(admission_stats())
+
+
 def main() -> None:  # pragma: no cover - CLI entrypoint
     import uvicorn
 
@@ -0,0 +1,449 @@
+"""Simulated telephony backend running on a virtual clock.
+
+``TELEPHONY_BACKEND=simulated`` replaces Twilio with :class:`SimulatedClient`.
+Each placed call is modelled as a sequence of events on a
+:class:`VirtualClock`: ring time, answer/busy/no-answer/failed outcomes, the
+IVR walk (DTMF choices or gather timeouts, resolved by parsing the TwiML the
+flow returns) and an agent pool with handle times. Events are delivered
+through :mod:`dialer.webhooks`, the same handlers the HTTP server uses, so
+status logging, IVR actions, consent and DNC writes and tracing all run as
+they would for real calls.
+
+Creating a client switches the process's audit log, local DNC list and span
+store to ``SIMULATION_DATA_DIR`` (default ``<data dir>/simulation``; the DNC
+list starts as a copy of the live one) and stamps rows and spans with the
+virtual clock, so synthetic consents, DNC actions and a simulated day's
+timeline never mix with live data.
+
+``DialerRunner`` sleeps on the client's clock between calls. At ``speed=0``
+the clock jumps straight to the next event, which makes a 100k-call day a
+matter of minutes::
+
+    python -m dialer.simulator --calls 100000 --interval 0.8 --agents 40
+"""
+from __future__ import annotations
+
+import argparse
+import heapq
+import itertools
+import math
+import random
+import shutil
+import sys
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from . import webhooks
+from .calls import STOP_POLL_SECONDS
+from .config import settings
+from .storage import storage
+from .tracing import store as span_store
+from .tracing import tracer
+
+# Rough text-to-speech pace used to time prompts before a gather or dial.
+SPEECH_CHARS_PER_SECOND = 14.0
+
+
+class VirtualClock:
+    """Heap-based event scheduler with a controllable notion of time.
+
+    ``speed`` is virtual seconds per real second; ``0`` runs events as fast
+    as possible.
+    """
+
+    def __init__(self, start: float | None = None, speed: float = 0.0) -> None:
+        self.start = start if start is not None else time.time()
+        self.now = self.start
+        self.speed = speed
+        self._events: list[Tuple[float, int, Callable[[], None]]] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def time(self) -> float:
+        return self.now
+
+    @property
+    def elapsed(self) -> float:
+        return self.now - self.start
+
+    def pending(self) -> int:
+        return len(self._events)
+
+    def call_at(self, when: float, callback: Callable[[], None]) -> None:
+        with self._lock:
+            heapq.heappush(self._events, (when, next(self._seq), callback))
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> None:
+        self.call_at(self.now + max(delay, 0.0), callback)
+
+    def sleep(self, seconds: float) -> None:
+        """Advance by ``seconds``, running every event that falls due."""
+
+        self.advance_to(self.now + max(seconds, 0.0))
+
+    def advance_to(self, target: float, realtime: bool = True) -> None:
+        while True:
+            with self._lock:
+                if not self._events or self._events[0][0] > target:
+                    break
+                when, _, callback = heapq.heappop(self._events)
+            self._wait(when, realtime)
+            callback()
+        self._wait(target, realtime)
+
+    def drain(self, should_stop: Callable[[], bool] | None = None) -> None:
+        """Run all scheduled events, including ones they schedule.
+
+        Once ``should_stop`` returns true the rest run without real-time
+        pacing, so stopping a slowed-down simulation does not block.
+        """
+
+        while True:
+            with self._lock:
+                if not self._events:
+                    return
+                when, _, callback = heapq.heappop(self._events)
+            self._wait(when, realtime=not (should_stop and should_stop()))
+            callback()
+
+    def _wait(self, when: float, realtime: bool) -> None:
+        if when <= self.now:
+            return
+        if realtime and self.speed > 0:
+            time.sleep((when - self.now) / self.speed)
+        self.now = when
+
+
+@dataclass
+class SimulationProfile:
+    """Probabilities and durations (virtual seconds) driving simulated calls."""
+
+    answer_rate: float = 0.55
+    busy_rate: float = 0.10
+    failed_rate: float = 0.01
+    ring_time: Tuple[float, float] = (3.0, 20.0)
+    no_answer_timeout: float = 30.0
+    busy_time: float = 2.0
+    # DTMF choice per gather; "" means the callee lets the gather time out.
+    dtmf_weights: Dict[str, float] = field(
+        default_factory=lambda: {"1": 0.35, "2": 0.45, "3": 0.05, "": 0.15}
+    )
+    think_time: Tuple[float, float] = (0.5, 4.0)
+    agents: int = 5
+    agent_answer_time: float = 2.0
+    agent_ring_timeout: float = 30.0
+    agent_handle_time: float = 180.0  # mean of an exponential distribution
+    agent_min_handle_time: float = 15.0
+
+    @classmethod
+    def from_settings(cls) -> "SimulationProfile":
+        return cls(agents=settings.simulation_agents)
+
+
+@dataclass
+class SimulationStats:
+    placed: int = 0
+    active: int = 0
+    max_active: int = 0
+    outcomes: Counter = field(default_factory=Counter)
+    digits: Counter = field(default_factory=Counter)
+    webhooks: Counter = field(default_factory=Counter)
+    agent_connects: int = 0
+    agent_misses: int = 0
+    agent_busy_seconds: float = 0.0
+    talk_seconds: float = 0.0
+
+
+@dataclass
+class _Call:
+    sid: str
+    number: str
+    answered_at: float = 0.0
+
+
+class SimulatedClient:
+    """``TelephonyClient`` whose calls play out on a :class:`VirtualClock`."""
+
+    simulated = True
+
+    def __init__(
+        self,
+        profile: SimulationProfile | None = None,
+        clock: VirtualClock | None = None,
+        seed: int | None = None,
+        data_dir: Path | None = None,
+    ) -> None:
+        self.profile = profile or SimulationProfile.from_settings()
+        self.clock = clock or VirtualClock(speed=settings.simulation_speed)
+        self.data_dir = data_dir or settings.simulation_data_dir
+        use_simulation_storage(self.data_dir, self.clock)
+        self.rng = random.Random(seed)
+        self.stats = SimulationStats()
+        self.agents_free = self.profile.agents
+        self._choices, self._weights = zip(*self.profile.dtmf_weights.items())
+
+    # ------------------------------------------------------------------
+    # TelephonyClient
+    # ------------------------------------------------------------------
+    def place_call(self, target_number: str) -> str:
+        call = _Call(sid=f"SIM{uuid.uuid4().hex}", number=target_number)
+        stats = self.stats
+        stats.placed += 1
+        stats.active += 1
+        stats.max_active = max(stats.max_active, stats.active)
+
+        profile = self.profile
+        self._status(call, "initiated")
+        roll = self.rng.random()
+        if roll < profile.failed_rate:
+            self.clock.call_later(0.5, lambda: self._finish(call, "failed"))
+            return call.sid
+        self.clock.call_later(0.5, lambda: self._status(call, "ringing"))
+        roll -= profile.failed_rate
+        if roll < profile.busy_rate:
+            self.clock.call_later(profile.busy_time, lambda: self._finish(call, "busy"))
+        elif roll < profile.busy_rate + profile.answer_rate:
+            ring = self.rng.uniform(*profile.ring_time)
+            self.clock.call_later(ring, lambda: self._answer(call))
+        else:
+            self.clock.call_later(
+                profile.no_answer_timeout, lambda: self._finish(call, "no-answer")
+            )
+        return call.sid
+
+    # ------------------------------------------------------------------
+    # Hooks used by DialerRunner
+    # ------------------------------------------------------------------
+    def sleep(self, seconds: float) -> None:
+        self.clock.sleep(seconds)
+
+    @property
+    def stop_poll_seconds(self) -> float:
+        """Virtual seconds between stop checks while ``DialerRunner`` waits."""
+
+        return STOP_POLL_SECONDS * self.clock.speed if self.clock.speed > 0 else math.inf
+
+    def settle(self, should_stop: Callable[[], bool] | None = None) -> None:
+        """Let every call in flight run to completion."""
+
+        self.clock.drain(should_stop)
+
+    # ------------------------------------------------------------------
+    # Call lifecycle
+    # ------------------------------------------------------------------
+    def _status(self, call: _Call, status: str, **extra: str) -> None:
+        self.stats.webhooks["status"] += 1
+        webhooks.status({"CallSid": call.sid, "To": call.number, "CallStatus": status, **extra})
+
+    def _answer(self, call: _Call) -> None:
+        call.answered_at = self.clock.now
+        self._status(call, "in-progress")
+        self.stats.webhooks["voice"] += 1
+        self._play(call, webhooks.voice(call.sid))
+
+    def _finish(self, call: _Call, outcome: str) -> None:
+        duration = int(self.clock.now - call.answered_at) if call.answered_at else 0
+        self.stats.outcomes[outcome] += 1
+        self.stats.talk_seconds += duration
+        self.stats.active -= 1
+        self._status(call, outcome, CallDuration=str(duration))
+
+    def _play(self, call: _Call, twiml: str) -> None:
+        """Act on a TwiML response the way a callee on the line would."""
+
+        root = ET.fromstring(twiml)
+        speech = sum(len(say.text or "") for say in root.iter("Say")) / SPEECH_CHARS_PER_SECOND
+        redirect = root.find("Redirect")
+        gather = root.find("Gather")
+        if gather is not None:
+            digits = self.rng.choices(self._choices, self._weights)[0]
+            self.stats.digits[digits or "timeout"] += 1
+            if digits:
+                delay = speech + self.rng.uniform(*self.profile.think_time)
+                url = gather.get("action", "")
+            else:
+                delay = speech + float(gather.get("timeout", 5))
+                url = redirect.text if redirect is not None else ""
+            self.clock.call_later(delay, lambda: self._request(call, url, digits))
+        elif root.find("Dial") is not None:
+            self.clock.call_later(speech, lambda: self._connect_agent(call))
+        elif redirect is not None:
+            url = redirect.text or ""
+            self.clock.call_later(speech, lambda: self._request(call, url, ""))
+        else:
+            self.clock.call_later(speech, lambda: self._finish(call, "completed"))
+
+    def _request(self, call: _Call, url: str, digits: str) -> None:
+        parts = urlsplit(url)
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        if parts.path.startswith("/ivr/"):
+            self.stats.webhooks["ivr"] += 1
+            twiml = webhooks.ivr(
+                parts.path[len("/ivr/"):],
+                query.get("v"),
+                int(query.get("attempt", 0)),
+                bool(int(query.get("input", 0))),
+                digits,
+                call.number,
+                call.sid,
+            )
+        elif parts.path == "/gather":
+            self.stats.webhooks["gather"] += 1
+            twiml = webhooks.gather(digits, call.number, call.sid)
+        else:
+            # Nothing else is served to callees; a real call would end here too.
+            self._finish(call, "completed")
+            return
+        self._play(call, twiml)
+
+    def _connect_agent(self, call: _Call) -> None:
+        profile = self.profile
+        agent_sid = f"SIMA{uuid.uuid4().hex}"
+
+        def agent_status(status: str, duration: int = 0) -> None:
+            self.stats.webhooks["agent-status"] += 1
+            webhooks.agent_status(
+                {
+                    "CallSid": agent_sid,
+                    "ParentCallSid": call.sid,
+                    "CallStatus": status,
+                    "CallDuration": str(duration),
+                }
+            )
+
+        agent_status("initiated")
+        if self.agents_free <= 0:
+            # Every agent is on a call: the Dial rings out and the call ends.
+            self.stats.agent_misses += 1
+
+            def missed() -> None:
+                agent_status("no-answer")
+                self._finish(call, "completed")
+
+            self.clock.call_later(profile.agent_ring_timeout, missed)
+            return
+
+        self.agents_free -= 1
+        self.stats.agent_connects += 1
+        handle = max(
+            self.rng.expovariate(1 / profile.agent_handle_time), profile.agent_min_handle_time
+        )
+
+        def hang_up() -> None:
+            self.agents_free += 1
+            self.stats.agent_busy_seconds += handle
+            agent_status("completed", int(handle))
+            self._finish(call, "completed")
+
+        self.clock.call_later(profile.agent_answer_time, lambda: agent_status("in-progress"))
+        self.clock.call_later(profile.agent_answer_time + handle, hang_up)
+
+
+def use_simulation_storage(directory: Path, clock: VirtualClock) -> None:
+    """Redirect storage and tracing to ``directory`` on ``clock`` time."""
+
+    directory.mkdir(parents=True, exist_ok=True)
+    dnc_file = directory / "dnc.json"
+    if not dnc_file.exists() and storage.dnc_file.exists():
+        # Start from the live DNC list so simulated skips stay realistic.
+        shutil.copyfile(storage.dnc_file, dnc_file)
+    storage.relocate(directory / "logs.sqlite", dnc_file)
+    storage.clock = clock.time
+    span_store.relocate(directory / "traces.sqlite")
+    tracer.clock_ns = lambda: int(clock.time() * 1_000_000_000)
+
+
+def _duration(seconds: float) -> str:
+    hours, rest = divmod(int(seconds), 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours:d}:{minutes:02d}:{secs:02d}"
+
+
+def report(client: SimulatedClient, wall_seconds: float) -> str:
+    stats = client.stats
+    virtual = client.clock.elapsed
+    lines = [
+        f"Calls placed:       {stats.placed}",
+        f"Virtual time:       {_duration(virtual)}  (wall {wall_seconds:.1f}s, "
+        f"{virtual / wall_seconds if wall_seconds else 0:.0f}x)",
+        f"Peak concurrent:    {stats.max_active}",
+        "Outcomes:           "
+        + ", ".join(f"{name} {count}" for name, count in stats.outcomes.most_common()),
+        "DTMF:               "
+        + ", ".join(f"{name} {count}" for name, count in stats.digits.most_common()),
+        f"Agent connects:     {stats.agent_connects}  (missed, all agents busy: {stats.agent_misses})",
+    ]
+    if virtual and client.profile.agents:
+        utilisation = stats.agent_busy_seconds / (client.profile.agents * virtual)
+        lines.append(f"Agent utilisation:  {utilisation:.1%} of {client.profile.agents} agents")
+    lines.append(
+        "Webhooks:           "
+        + ", ".join(f"{name} {count}" for name, count in stats.webhooks.most_common())
+    )
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:  # pragma: no cover - CLI entrypoint
+    from .calls import DialerRunner
+
+    parser = argparse.ArgumentParser(description="Simulate a dialing campaign on a virtual clock.")
+    parser.add_argument("--calls", type=int, default=1000, help="Synthetic numbers to dial")
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=None,
+        help="Virtual seconds between calls (default: DIAL_INTERVAL_SECONDS)",
+    )
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=0.0,
+        help="Virtual seconds per real second (0 = as fast as possible)",
+    )
+    parser.add_argument("--agents", type=int, default=settings.simulation_agents)
+    parser.add_argument("--answer-rate", type=float, default=SimulationProfile.answer_rate)
+    parser.add_argument("--busy-rate", type=float, default=SimulationProfile.busy_rate)
+    parser.add_argument(
+        "--handle-time",
+        type=float,
+        default=SimulationProfile.agent_handle_time,
+        help="Mean agent handle time in seconds",
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    profile = SimulationProfile(
+        answer_rate=args.answer_rate,
+        busy_rate=args.busy_rate,
+        agents=args.agents,
+        agent_handle_time=args.handle_time,
+    )
+    client = SimulatedClient(profile, VirtualClock(speed=args.speed), seed=args.seed)
+    runner = DialerRunner(client=client, interval=args.interval)
+    numbers = [f"+35850{index:07d}" for index in range(args.calls)]
+    started = time.perf_counter()
+    runner.run(numbers)
+    print(report(client, time.perf_counter() - started))
+    print(f"Logs and traces: {client.data_dir}")
+    return 0
+
+
+__all__ = [
+    "SimulatedClient",
+    "SimulationProfile",
+    "SimulationStats",
+    "VirtualClock",
+    "report",
+    "use_simulation_storage",
+]
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
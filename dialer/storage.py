@@ -4,11 +4,14 @@ from __future__ import annotations
 import json
 import sqlite3
 import threading
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import Iterable, List
+from typing import Callable, Iterable, Iterator, List, Tuple
 
 from .config import settings
+from .numberset import CombinedNumberSet, NumberSet
+from .tracing import tracer
 
 _NUMBERS_FILE = settings.data_dir / "numbers.json"
 _DNC_FILE = settings.data_dir / "dnc.json"
@@ -16,6 +19,13 @@ _DB_PATH = settings.sqlite_path
 
 _LOCK = threading.RLock()
 
+EXPORT_TABLES = {
+    "call_events": ("id", "call_sid", "number", "event", "ts", "payload_json"),
+    "consents": ("id", "number", "action", "ts", "source"),
+    "inputs": ("id", "number", "ts", "source"),
+}
+_EVENT_COLUMNS = {"call_events": "event", "consents": "action"}
+
 
 class DialerStorage:
     """Helpers for working with number lists, DNC and logs."""
@@ -24,9 +34,26 @@ class DialerStorage:
         self.numbers_file = _NUMBERS_FILE
         self.dnc_file = _DNC_FILE
         self.db_path = _DB_PATH
+        self.dnc_registry_path = settings.dnc_registry_path
+        # Source of log timestamps; the simulator swaps in its virtual clock.
+        self.clock: Callable[[], float] = time.time
+        self._counters = {"numbers": 0, "dnc": 0}
+        self._dnc_cache: Tuple[str, NumberSet] | None = None
+        self._registry_cache: Tuple[Tuple[int, int], NumberSet] | None = None
         self._ensure_files()
         self._ensure_database()
 
+    def relocate(self, db_path: Path, dnc_file: Path) -> None:
+        """Point the audit log and local DNC list at other files."""
+
+        with _LOCK:
+            self.db_path = db_path
+            self.dnc_file = dnc_file
+            self._dnc_cache = None
+            self._counters["dnc"] += 1
+            self._ensure_files()
+            self._ensure_database()
+
     # ------------------------------------------------------------------
     # Number list helpers
     # ------------------------------------------------------------------
@@ -40,31 +67,29 @@ class DialerStorage:
     def save_numbers(self, numbers: Iterable[str]) -> None:
         """Persist unique numbers, preserving ordering."""
 
-        seen = set()
-        unique_numbers = []
-        for number in numbers:
-            if number not in seen:
-                unique_numbers.append(number)
-                seen.add(number)
-
-        with _LOCK:
-            with self.numbers_file.open("w", encoding="utf-8") as fh:
-                json.dump(unique_numbers, fh, indent=2)
+        # dict.fromkeys de-duplicates while keeping first-seen order.
+        self._write_numbers(list(dict.fromkeys(numbers)))
 
     def append_numbers(self, numbers: Iterable[str]) -> List[str]:
         """Append new numbers and return resulting list."""
 
         with _LOCK:
             existing_list = self.list_numbers()
-            existing = set(existing_list)
-            merged = list(existing_list)
-            for number in numbers:
-                if number not in existing:
-                    merged.append(number)
-                    existing.add(number)
-            self.save_numbers(merged)
+            # Index the (usually few) incoming numbers, not the whole list.
+            incoming = dict.fromkeys(numbers)
+            for number in existing_list:
+                if number in incoming:
+                    del incoming[number]
+            merged = existing_list + list(incoming)
+            self._write_numbers(merged)
             return merged
 
+    def _write_numbers(self, numbers: List[str]) -> None:
+        with _LOCK:
+            with self.numbers_file.open("w", encoding="utf-8") as fh:
+                json.dump(numbers, fh, indent=2)
+            self._counters["numbers"] += 1
+
     def clear_numbers(self) -> None:
         """Remove all queued numbers."""
 
@@ -80,41 +105,117 @@ class DialerStorage:
 
     def add_to_dnc(self, number: str) -> None:
         with _LOCK:
-            entries = set(self.list_dnc())
-            if number not in entries:
-                entries.add(number)
-                with self.dnc_file.open("w", encoding="utf-8") as fh:
-                    json.dump(sorted(entries), fh, indent=2)
+            if number in self.dnc_index():
+                return
+            entries = self.list_dnc()
+            entries.append(number)
+            with self.dnc_file.open("w", encoding="utf-8") as fh:
+                json.dump(sorted(entries), fh, indent=2)
+            self._counters["dnc"] += 1
 
     def is_dnc(self, number: str) -> bool:
-        return number in set(self.list_dnc())
+        return number in self.dnc_index()
+
+    def dnc_index(self) -> CombinedNumberSet:
+        """Return the local DNC list plus the optional registry as one index.
+
+        The local ``dnc.json`` is re-encoded only when it changes and the
+        binary registry (``DNC_REGISTRY_PATH``) is memory-mapped, so lookups
+        are binary searches over int64 buffers rather than JSON reads.
+        """
+
+        with _LOCK:
+            version = self.dnc_version()
+            if self._dnc_cache is None or self._dnc_cache[0] != version:
+                local = NumberSet.from_numbers(self.list_dnc(), strict=False)
+                self._dnc_cache = (version, local)
+            return CombinedNumberSet(self._dnc_cache[1], self._registry())
+
+    def split_dnc(self, numbers: List[str]) -> Tuple[List[str], List[str]]:
+        """Return ``(allowed, blocked)`` for ``numbers``, checked in one batch."""
+
+        allowed: List[str] = []
+        blocked: List[str] = []
+        for number, is_blocked in zip(numbers, self.dnc_index().contains_many(numbers)):
+            (blocked if is_blocked else allowed).append(number)
+        return allowed, blocked
+
+    def _registry(self) -> NumberSet:
+        path = self.dnc_registry_path
+        if path is None:
+            return NumberSet()
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return NumberSet()
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if self._registry_cache is None or self._registry_cache[0] != signature:
+            self._registry_cache = (signature, NumberSet.load(path))
+        return self._registry_cache[1]
+
+    # ------------------------------------------------------------------
+    # Change tracking
+    # ------------------------------------------------------------------
+    def numbers_version(self) -> str:
+        """Return a token that changes whenever the number list changes."""
+
+        return self._file_version("numbers", self.numbers_file)
+
+    def dnc_version(self) -> str:
+        """Return a token that changes whenever the DNC list or registry changes."""
+
+        version = self._file_version("dnc", self.dnc_file)
+        if self.dnc_registry_path is not None:
+            try:
+                stat = self.dnc_registry_path.stat()
+            except FileNotFoundError:
+                return version
+            version = f"{version}-{stat.st_mtime_ns}-{stat.st_size}"
+        return version
+
+    def events_version(self) -> int:
+        """Return the newest call event id; events are append-only."""
+
+        rows = list(self._query("SELECT MAX(id) AS last_id FROM call_events"))
+        return rows[0]["last_id"] or 0
+
+    def _file_version(self, name: str, path: Path) -> str:
+        # The in-process counter covers filesystems with coarse mtimes, the
+        # stat covers writes from other processes (TUI vs. web server).
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return f"{self._counters[name]}-0-0"
+        return f"{self._counters[name]}-{stat.st_mtime_ns}-{stat.st_size}"
 
     # ------------------------------------------------------------------
     # Logging helpers
     # ------------------------------------------------------------------
     def log_call_event(self, call_sid: str, number: str, event: str, payload: dict) -> None:
-        self._execute(
-            """
-            INSERT INTO call_events(call_sid, number, event, ts, payload_json)
-            VALUES(?, ?, ?, ?, ?)
-            """,
-            (
-                call_sid,
-                number,
-                event,
-                datetime.utcnow().isoformat(),
-                json.dumps(payload, ensure_ascii=False),
-            ),
-        )
+        with tracer.span("storage.log_call_event", event=event):
+            self._execute(
+                """
+                INSERT INTO call_events(call_sid, number, event, ts, payload_json)
+                VALUES(?, ?, ?, ?, ?)
+                """,
+                (
+                    call_sid,
+                    number,
+                    event,
+                    self._timestamp(),
+                    json.dumps(payload, ensure_ascii=False),
+                ),
+            )
 
     def log_consent(self, number: str, action: str, source: str) -> None:
-        self._execute(
-            """
-            INSERT INTO consents(number, action, ts, source)
-            VALUES(?, ?, ?, ?)
-            """,
-            (number, action, datetime.utcnow().isoformat(), source),
-        )
+        with tracer.span("storage.log_consent", action=action):
+            self._execute(
+                """
+                INSERT INTO consents(number, action, ts, source)
+                VALUES(?, ?, ?, ?)
+                """,
+                (number, action, self._timestamp(), source),
+            )
 
     def log_input(self, number: str, source: str) -> None:
         self._execute(
@@ -122,7 +223,7 @@ class DialerStorage:
             INSERT INTO inputs(number, ts, source)
             VALUES(?, ?, ?)
             """,
-            (number, datetime.utcnow().isoformat(), source),
+            (number, self._timestamp(), source),
         )
 
     def recent_events(self, limit: int = 20) -> List[sqlite3.Row]:
@@ -138,9 +239,92 @@ class DialerStorage:
             )
         )
 
+    def events_after(self, last_id: int, limit: int = 50) -> List[sqlite3.Row]:
+        """Return up to ``limit`` newest events with ``id`` above ``last_id``."""
+
+        return list(
+            self._query(
+                """
+                SELECT id, call_sid, number, event, ts
+                FROM call_events
+                WHERE id > ?
+                ORDER BY id DESC
+                LIMIT ?
+                """,
+                (last_id, limit),
+            )
+        )
+
+    def iter_rows(
+        self,
+        table: str,
+        *,
+        since: str | None = None,
+        until: str | None = None,
+        number: str | None = None,
+        event: str | None = None,
+        chunk_size: int = 500,
+    ) -> Iterator[sqlite3.Row]:
+        """Yield rows of a log table in id order, one chunk at a time.
+
+        Each chunk is a separate keyset query (``id > last_id``) so no read
+        transaction is held open between chunks and writers are never blocked
+        by a long export. ``since``/``until`` are inclusive ISO timestamps (a
+        bare ``YYYY-MM-DD`` date for ``until`` covers the whole day) and
+        ``event`` filters ``call_events.event`` or ``consents.action``.
+        """
+
+        if table not in EXPORT_TABLES:
+            raise ValueError(f"Unknown table: {table}")
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+
+        clauses = ["id > ?"]
+        filters: list[str] = []
+        if since:
+            clauses.append("ts >= ?")
+            filters.append(since)
+        if until:
+            if len(until) == 10:
+                until = f"{until}T23:59:59.999999"
+            clauses.append("ts <= ?")
+            filters.append(until)
+        if number:
+            clauses.append("number = ?")
+            filters.append(number)
+        if event:
+            column = _EVENT_COLUMNS.get(table)
+            if column is None:
+                raise ValueError(f"Table {table} has no event column")
+            clauses.append(f"{column} = ?")
+            filters.append(event)
+
+        sql = (
+            f"SELECT {', '.join(EXPORT_TABLES[table])} FROM {table} "
+            f"WHERE {' AND '.join(clauses)} ORDER BY id LIMIT ?"
+        )
+        return self._iter_chunks(sql, tuple(filters), chunk_size)
+
     # ------------------------------------------------------------------
     # Internal helpers
     # ------------------------------------------------------------------
+    def _timestamp(self) -> str:
+        return datetime.utcfromtimestamp(self.clock()).isoformat()
+
+    def _iter_chunks(self, sql: str, filters: tuple, chunk_size: int) -> Iterator[sqlite3.Row]:
+        # Each chunk uses its own short-lived connection: streaming responses
+        # advance this generator from whichever threadpool worker is free, and
+        # sqlite3 connections must stay on the thread that created them.
+        last_id = 0
+        while True:
+            rows = list(self._query(sql, (last_id, *filters, chunk_size)))
+            if not rows:
+                return
+            yield from rows
+            last_id = rows[-1]["id"]
+            if len(rows) < chunk_size:
+                return
+
     def _ensure_files(self) -> None:
         for path in (self.numbers_file, self.dnc_file):
             if not path.exists():
@@ -0,0 +1,47 @@
+"""Test settings: dummy Twilio credentials and a throwaway data directory."""
+from __future__ import annotations
+
+import os
+import tempfile
+
+import pytest
+
+# dialer.config reads the environment on import, so this must run first.
+_DATA_DIR = tempfile.mkdtemp(prefix="dialer-tests-")
+for _name, _value in {
+    "TWILIO_ACCOUNT_SID": "ACtest",
+    "TWILIO_AUTH_TOKEN": "test",
+    "TWILIO_NUMBER": "+358401234567",
+    "AGENT_NUMBER": "+358401234568",
+    "PUBLIC_BASE_URL": "http://test",
+    "DIALER_DATA_DIR": _DATA_DIR,
+    "SQLITE_PATH": os.path.join(_DATA_DIR, "logs.sqlite"),
+    "DIALER_DRY_RUN": "true",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+
+@pytest.fixture
+def restore_storage():
+    """Undo the storage/tracing redirection a simulated client applies."""
+
+    from dialer.storage import storage
+    from dialer.tracing import store, tracer
+
+    db_path, dnc_file, clock = storage.db_path, storage.dnc_file, storage.clock
+    span_db, clock_ns = store.db_path, tracer.clock_ns
+    yield
+    storage.relocate(db_path, dnc_file)
+    storage.clock = clock
+    store.relocate(span_db)
+    tracer.clock_ns = clock_ns
+
+
+@pytest.fixture
+def isolated_storage(tmp_path, restore_storage):
+    """The shared ``storage`` pointed at an empty per-test database."""
+
+    from dialer.storage import storage
+
+    storage.relocate(tmp_path / "logs.sqlite", tmp_path / "dnc.json")
+    return storage
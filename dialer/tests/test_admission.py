@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from dialer.admission import AdmissionController, AdmissionMiddleware, ClassPolicy, classify
+from dialer.config import settings
+from dialer.server import app
+from dialer.storage import storage
+
+
+def test_slow_dashboard_render_does_not_block_webhooks(monkeypatch):
+    numbers_version = storage.numbers_version
+
+    def slow_numbers_version() -> str:
+        time.sleep(0.5)  # blocking SQLite/file I/O stand-in
+        return numbers_version()
+
+    monkeypatch.setattr(storage, "numbers_version", slow_numbers_version)
+
+    async def scenario() -> float:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            started = time.perf_counter()
+            page = asyncio.create_task(client.get("/"))
+            # A blocked loop would also delay waking up from this sleep, so
+            # latency counts from when the webhook was due, not when it ran.
+            await asyncio.sleep(0.1)
+            response = await client.post("/voice", data={"CallSid": "CA1"})
+            latency = time.perf_counter() - started - 0.1
+            assert response.status_code == 200
+            assert (await page).status_code == 200
+            return latency
+
+    assert asyncio.run(scenario()) < 0.3
+
+
+@pytest.mark.parametrize(
+    "path, expected",
+    [
+        ("/voice", "telephony"),
+        ("/gather", "telephony"),
+        ("/status", "telephony"),
+        ("/agent-status", "telephony"),
+        ("/ivr/intro", "telephony"),
+        ("/export/call_events", "bulk"),
+        ("/traces/CA1/otlp", "bulk"),
+        ("/traces/CA1", "ui"),
+        ("/", "ui"),
+        ("/static/main.css", "ui"),
+        ("/voice/extra", "ui"),
+        ("/admission", None),
+    ],
+)
+def test_classify(path, expected):
+    assert classify(path) == expected
+
+
+def _controller(**overrides: ClassPolicy) -> AdmissionController:
+    policies = {
+        "telephony": ClassPolicy(concurrency=4, queue_timeout=0.05),
+        "ui": ClassPolicy(concurrency=2, rate=100, burst=100, yield_to_telephony=0.75),
+        "bulk": ClassPolicy(concurrency=1, rate=100, burst=100, yield_to_telephony=0.25),
+    }
+    policies.update(overrides)
+    return AdmissionController(policies)
+
+
+def test_ui_and_bulk_are_shed_while_telephony_is_busy():
+    async def scenario() -> None:
+        controller = _controller()
+        assert await controller.acquire("telephony") is None
+        # 1 of 4 telephony slots busy: bulk yields at 25 %, ui not yet.
+        assert await controller.acquire("bulk") == "telephony_busy"
+        assert await controller.acquire("ui") is None
+        controller.release("ui")
+        for _ in range(2):
+            assert await controller.acquire("telephony") is None
+        assert await controller.acquire("ui") == "telephony_busy"
+        for _ in range(3):
+            controller.release("telephony")
+        assert await controller.acquire("ui") is None
+        assert await controller.acquire("bulk") is None
+
+    asyncio.run(scenario())
+
+
+def test_telephony_queues_briefly_then_times_out():
+    async def scenario() -> None:
+        controller = _controller(telephony=ClassPolicy(concurrency=1, queue_timeout=0.2))
+        assert await controller.acquire("telephony") is None
+        waiter = asyncio.create_task(controller.acquire("telephony"))
+        await asyncio.sleep(0.05)
+        controller.release("telephony")
+        assert await waiter is None
+        assert await controller.acquire("telephony") == "queue_timeout"
+
+    asyncio.run(scenario())
+
+
+def test_concurrency_rejections_do_not_drain_the_rate_limit():
+    async def scenario() -> None:
+        controller = _controller(ui=ClassPolicy(concurrency=1, rate=0.001, burst=2))
+        assert await controller.acquire("ui") is None
+        for _ in range(5):
+            assert await controller.acquire("ui") == "concurrency"
+        controller.release("ui")
+        # One token is left because the five refusals were never charged.
+        assert await controller.acquire("ui") is None
+        controller.release("ui")
+        assert await controller.acquire("ui") == "rate_limited"
+        # A rate-limited request gives its concurrency slot back.
+        assert controller.states["ui"].in_flight == 0
+        assert not controller.states["ui"].semaphore.locked()
+
+    asyncio.run(scenario())
+
+
+def test_middleware_answers_503_with_retry_after():
+    async def scenario() -> list:
+        controller = _controller(ui=ClassPolicy(concurrency=1, rate=0.001, burst=1))
+        sent: list = []
+
+        async def app(scope, receive, send) -> None:
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        async def send(message) -> None:
+            sent.append(message)
+
+        middleware = AdmissionMiddleware(app, controller)
+        scope = {"type": "http", "path": "/", "headers": []}
+        await middleware(scope, None, send)
+        await middleware(scope, None, send)
+        assert controller.stats()["ui"]["shed"] == {"rate_limited": 1}
+        assert controller.stats()["ui"]["in_flight"] == 0
+        return sent
+
+    sent = asyncio.run(scenario())
+    assert [message.get("status") for message in sent if "status" in message] == [200, 503]
+    headers = dict(sent[2]["headers"])
+    assert headers[b"retry-after"] == str(settings.admission_retry_after).encode()
+    assert json.loads(sent[3]["body"]) == {"error": "overloaded", "reason": "rate_limited"}
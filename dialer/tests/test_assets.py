@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import gzip
+
+import pytest
+from starlette.requests import Request
+
+from dialer.webui.assets import StaticAssets
+
+
+def _request(**headers: str) -> Request:
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "query_string": b"", "headers": raw})
+
+
+@pytest.fixture
+def static(tmp_path):
+    (tmp_path / "main.css").write_text("body { color: black; }\n" * 200)
+    (tmp_path / "tiny.css").write_text("a{}")
+    return StaticAssets(tmp_path)
+
+
+def test_static_assets_have_one_etag_per_encoding(static):
+    url = static.url("main.css")
+    assert url.startswith("/static/main.") and url != "/static/main.css"
+    hashed = url.removeprefix("/static/")
+
+    gzipped = static.response(_request(accept_encoding="gzip"), hashed)
+    plain = static.response(_request(accept_encoding="identity"), hashed)
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(gzipped.body) == plain.body
+    assert "content-encoding" not in plain.headers
+    assert gzipped.headers["etag"] != plain.headers["etag"]
+    assert "immutable" in gzipped.headers["cache-control"]
+
+    # A validator only matches the representation it was issued for.
+    revalidated = static.response(
+        _request(accept_encoding="gzip", if_none_match=gzipped.headers["etag"]), hashed
+    )
+    assert revalidated.status_code == 304
+    switched = static.response(
+        _request(accept_encoding="identity", if_none_match=gzipped.headers["etag"]), hashed
+    )
+    assert switched.status_code == 200 and switched.body == plain.body
+
+
+def test_plain_names_are_revalidated_and_small_files_uncompressed(static):
+    response = static.response(_request(accept_encoding="gzip"), "tiny.css")
+    assert response.headers["cache-control"] == "no-cache"
+    assert "content-encoding" not in response.headers
+    revalidated = static.response(_request(if_none_match=response.headers["etag"]), "tiny.css")
+    assert revalidated.status_code == 304
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import gzip
+from email.utils import formatdate
+
+import pytest
+from jinja2 import DictLoader, Environment, FileSystemLoader
+from starlette.requests import Request
+
+from dialer.webui import caching
+from dialer.webui.caching import (
+    FragmentCache,
+    cached_template,
+    make_etag,
+    not_modified,
+    template_fingerprint,
+)
+
+
+def _request(**headers: str) -> Request:
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "query_string": b"", "headers": raw})
+
+
+def test_etags_are_weak_and_stable():
+    assert make_etag(("a", 1)) == make_etag(("a", 1))
+    assert make_etag(("a", 1)) != make_etag(("a", 2))
+    assert make_etag(("a", 1)).startswith('W/"')
+
+
+@pytest.mark.parametrize(
+    "if_none_match, expected",
+    [
+        ('"abc"', True),
+        ('W/"abc"', True),
+        ('"other", W/"abc"', True),
+        ("*", True),
+        ('"other"', False),
+    ],
+)
+def test_if_none_match_uses_weak_comparison(if_none_match, expected):
+    assert not_modified(_request(if_none_match=if_none_match), 'W/"abc"') is expected
+
+
+def test_if_none_match_takes_precedence_over_date():
+    request = _request(if_none_match='"other"', if_modified_since=formatdate(2_000_000_000, usegmt=True))
+    assert not not_modified(request, '"abc"', last_modified=1_000_000_000)
+
+
+def test_if_modified_since():
+    since = formatdate(1_000_000_000, usegmt=True)
+    assert not_modified(_request(if_modified_since=since), '"abc"', last_modified=1_000_000_000.5)
+    assert not not_modified(_request(if_modified_since=since), '"abc"', last_modified=1_000_000_001)
+    assert not not_modified(_request(if_modified_since="garbage"), '"abc"', last_modified=0)
+    assert not not_modified(_request(), '"abc"', last_modified=0)
+
+
+def test_cached_template_negotiates_304_and_skips_rendering():
+    env = Environment(loader=DictLoader({"page.html": "count={{ count }}"}))
+    cache = FragmentCache()
+    renders = []
+
+    def context():
+        renders.append(1)
+        return {"count": 1}
+
+    first = cached_template(_request(), cache, env, "page.html", (1,), context)
+    assert first.status_code == 200 and first.body == b"count=1"
+    etag = first.headers["etag"]
+
+    again = cached_template(_request(if_none_match=etag), cache, env, "page.html", (1,), context)
+    assert again.status_code == 304 and again.headers["etag"] == etag
+    assert len(renders) == 1
+
+    changed = cached_template(_request(if_none_match=etag), cache, env, "page.html", (2,), context)
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+
+
+def test_template_edits_change_the_etag(tmp_path, monkeypatch):
+    monkeypatch.setattr(caching, "TEMPLATE_CHECK_INTERVAL", 0)
+    template = tmp_path / "page.html"
+    template.write_text("one")
+    env = Environment(loader=FileSystemLoader(str(tmp_path)), auto_reload=True)
+    before = cached_template(_request(), FragmentCache(), env, "page.html", (1,), dict)
+    template.write_text("two, longer")
+    after = cached_template(
+        _request(if_none_match=before.headers["etag"]), FragmentCache(), env, "page.html", (1,), dict
+    )
+    assert after.status_code == 200 and after.body == b"two, longer"
+
+
+def test_template_directory_is_scanned_once_per_interval(tmp_path, monkeypatch):
+    (tmp_path / "page.html").write_text("one")
+    env = Environment(loader=FileSystemLoader(str(tmp_path)))
+    scans = []
+    scandir = caching.os.scandir
+
+    def counting_scandir(path):
+        scans.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(caching.os, "scandir", counting_scandir)
+    first = template_fingerprint(env)
+    for _ in range(10):
+        assert template_fingerprint(env) == first
+    assert len(scans) == 1
+
+    monkeypatch.setattr(caching, "TEMPLATE_CHECK_INTERVAL", 0)
+    (tmp_path / "page.html").write_text("two, longer")
+    assert template_fingerprint(env) != first
+
+
+def test_cached_fragments_are_gzipped_once(monkeypatch):
+    env = Environment(loader=DictLoader({"page.html": "<p>{{ text }}</p>"}))
+    cache = FragmentCache()
+    compressions = []
+    compress = gzip.compress
+
+    def counting_compress(data, *args, **kwargs):
+        compressions.append(len(data))
+        return compress(data, *args, **kwargs)
+
+    monkeypatch.setattr(gzip, "compress", counting_compress)
+    context = lambda: {"text": "rivi " * 500}  # noqa: E731
+
+    plain = cached_template(_request(), cache, env, "page.html", (1,), context)
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["vary"] == "Accept-Encoding"
+    for _ in range(3):
+        request = _request(accept_encoding="gzip, br")
+        zipped = cached_template(request, cache, env, "page.html", (1,), context)
+        assert zipped.headers["content-encoding"] == "gzip"
+        assert gzip.decompress(zipped.body) == plain.body
+    assert len(compressions) == 1
+
+
+def test_small_fragments_are_not_compressed():
+    env = Environment(loader=DictLoader({"page.html": "tiny"}))
+    request = _request(accept_encoding="gzip")
+    response = cached_template(request, FragmentCache(), env, "page.html", (1,), dict)
+    assert "content-encoding" not in response.headers and response.body == b"tiny"
+
+
+def test_middleware_passes_cached_gzip_through(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from dialer.server import app
+
+    client = TestClient(app)
+    client.get("/", headers={"Accept-Encoding": "gzip"})
+    compressions = []
+    compress = gzip.compress
+
+    def counting_compress(data, *args, **kwargs):
+        compressions.append(len(data))
+        return compress(data, *args, **kwargs)
+
+    monkeypatch.setattr(gzip, "compress", counting_compress)
+    response = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "<html" in response.text.lower()
+    assert compressions == []
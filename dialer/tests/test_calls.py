@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+
+from dialer.calls import DialerRunner
+from dialer.workqueue import SQLiteQueueBackend
+
+CAMPAIGN = "test"
+
+
+class FakeClient:
+    def __init__(self) -> None:
+        self.called: list[str] = []
+        self._sids = itertools.count()
+
+    def place_call(self, target_number: str) -> str:
+        self.called.append(target_number)
+        return f"CA{next(self._sids)}"
+
+
+def _run_in_thread(target) -> threading.Thread:
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_stop_interrupts_wait_for_leases_held_elsewhere(tmp_path):
+    backend = SQLiteQueueBackend(tmp_path / "queue.sqlite")
+    backend.enqueue(CAMPAIGN, ["+358401234567"])
+    # Another node holds the only item, so the runner idles until it expires.
+    assert backend.claim(CAMPAIGN, "other-node", 1, 60)
+    client = FakeClient()
+    runner = DialerRunner(client, interval=0)
+    stop = threading.Event()
+
+    thread = _run_in_thread(
+        lambda: runner.run_queue(backend, CAMPAIGN, worker="idle-node", should_stop=stop.is_set)
+    )
+    time.sleep(0.3)
+    assert thread.is_alive()
+    started = time.monotonic()
+    stop.set()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert time.monotonic() - started < 1.0
+    assert client.called == []
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+from prompt_toolkit.application import create_app_session
+from prompt_toolkit.input import create_pipe_input
+from prompt_toolkit.output import DummyOutput
+
+from dialer import cli_tui
+from dialer.calls import DialerRunner
+from dialer.config import settings
+from dialer.workqueue import DONE, LEASED, PENDING, SQLiteQueueBackend
+
+NUMBERS = ["+358401234501", "+358401234502", "+358401234503"]
+
+
+def test_exit_releases_leases_held_by_the_dial_thread(tmp_path, isolated_storage, monkeypatch):
+    backend = SQLiteQueueBackend(tmp_path / "queue.sqlite")
+    backend.enqueue(settings.campaign, NUMBERS)
+    # A long interval keeps the runner holding its batch between calls.
+    monkeypatch.setattr(cli_tui, "DialerRunner", lambda: DialerRunner(interval=60))
+
+    async def scenario() -> bool:
+        tui = cli_tui.DialerTUI()
+        task = asyncio.ensure_future(tui._dial(backend))
+        deadline = time.monotonic() + 5
+        while not tui.results and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        assert backend.counts(settings.campaign).get(LEASED, 0) > 0
+        stopped = tui.wait_for_dialer(timeout=5)
+        await asyncio.wait_for(task, 5)
+        return stopped
+
+    with create_pipe_input() as pipe, create_app_session(input=pipe, output=DummyOutput()):
+        assert asyncio.run(scenario())
+    counts = backend.counts(settings.campaign)
+    assert counts.get(LEASED, 0) == 0
+    assert counts == {DONE: 1, PENDING: len(NUMBERS) - 1}
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from dialer.exports import stream_export
+
+
+def _at(iso: str) -> float:
+    return datetime.fromisoformat(iso).replace(tzinfo=timezone.utc).timestamp()
+
+
+@pytest.fixture
+def storage(isolated_storage):
+    for index in range(7):
+        isolated_storage.log_call_event(f"CA{index}", f"+35840000000{index}", "initiated", {"i": index})
+    return isolated_storage
+
+
+@pytest.mark.parametrize("chunk_size, queries", [(3, 3), (7, 2), (1, 8), (100, 1)])
+def test_rows_are_read_in_keyset_chunks(storage, monkeypatch, chunk_size, queries):
+    calls = []
+    query = storage._query
+
+    def counting_query(sql, params=None):
+        calls.append(params)
+        return query(sql, params)
+
+    monkeypatch.setattr(storage, "_query", counting_query)
+    rows = list(storage.iter_rows("call_events", chunk_size=chunk_size))
+    assert [row["call_sid"] for row in rows] == [f"CA{index}" for index in range(7)]
+    assert len(calls) == queries
+    # Each chunk resumes after the last id of the previous one.
+    resume_after = [rows[index * chunk_size - 1]["id"] if index else 0 for index in range(queries)]
+    assert [params[0] for params in calls] == resume_after
+
+
+def test_date_only_until_covers_the_whole_day(isolated_storage):
+    for iso in ("2024-03-01T00:00:00", "2024-03-01T23:59:59.500000", "2024-03-02T00:00:00"):
+        isolated_storage.clock = lambda iso=iso: _at(iso)
+        isolated_storage.log_consent("+358401234567", "accepted", "ivr")
+    rows = list(isolated_storage.iter_rows("consents", since="2024-03-01", until="2024-03-01"))
+    assert [row["ts"] for row in rows] == ["2024-03-01T00:00:00", "2024-03-01T23:59:59.500000"]
+    full = list(isolated_storage.iter_rows("consents", until="2024-03-01T12:00:00"))
+    assert len(full) == 1
+
+
+def test_event_and_number_filters(storage):
+    storage.log_call_event("CA9", "+358400000001", "completed", {})
+    completed = list(storage.iter_rows("call_events", event="completed"))
+    assert [row["call_sid"] for row in completed] == ["CA9"]
+    by_number = list(storage.iter_rows("call_events", number="+358400000001"))
+    assert [row["call_sid"] for row in by_number] == ["CA1", "CA9"]
+
+
+@pytest.mark.parametrize(
+    "kwargs, message",
+    [
+        ({"table": "inputs", "event": "accepted"}, "has no event column"),
+        ({"table": "users"}, "Unknown table"),
+        ({"table": "consents", "chunk_size": 0}, "chunk_size"),
+    ],
+)
+def test_invalid_filters_are_rejected_before_reading(isolated_storage, kwargs, message):
+    table = kwargs.pop("table")
+    with pytest.raises(ValueError, match=message):
+        isolated_storage.iter_rows(table, **kwargs)
+
+
+def test_stream_export_validates_eagerly(isolated_storage):
+    with pytest.raises(ValueError, match="Unknown format"):
+        stream_export("consents", "xml")
+    with pytest.raises(ValueError, match="no event column"):
+        stream_export("inputs", "csv", event="x")
+
+
+def test_csv_and_jsonl_output(storage):
+    csv_text = "".join(stream_export("call_events", "csv", chunk_size=2, batch_bytes=1))
+    lines = csv_text.strip().splitlines()
+    assert lines[0] == "id,call_sid,number,event,ts,payload_json"
+    assert len(lines) == 8
+
+    records = [json.loads(line) for line in "".join(stream_export("call_events", "jsonl")).splitlines()]
+    assert [record["payload"] for record in records] == [{"i": index} for index in range(7)]
+    assert "payload_json" not in records[0]
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import copy
+import json
+import os
+
+import pytest
+
+from dialer.ivr_flow import FlowError, FlowManager, compile_flow, load_definition, validate
+
+FLOW = {
+    "start": "intro",
+    "nodes": {
+        "intro": {
+            "say": "Paina 1 tai 2.",
+            "gather": {"num_digits": 1, "timeout": 5},
+            "retries": 1,
+            "options": {
+                "1": {"actions": [{"type": "consent", "action": "accepted"}], "next": "connect"},
+                "2": {"next": "goodbye"},
+            },
+            "on_invalid": "goodbye",
+        },
+        "connect": {"say": "Yhdistetään.", "dial": "agent"},
+        "goodbye": {"say": "Kiitos.", "hangup": True},
+    },
+}
+
+
+def _broken(**changes) -> dict:
+    flow = copy.deepcopy(FLOW)
+    for path, value in changes.items():
+        node, _, field = path.partition("__")
+        if field:
+            flow["nodes"][node][field] = value
+        else:
+            flow[node] = value
+    return flow
+
+
+def test_valid_flow_compiles():
+    validate(FLOW)
+    flow = compile_flow(copy.deepcopy(FLOW), "v1")
+    assert flow.version == "v1"
+    assert "<Gather" in flow.entry() and "/ivr/intro?v=v1" in flow.entry()
+
+
+@pytest.mark.parametrize(
+    "definition, message",
+    [
+        ([], "must be a mapping"),
+        ({"start": "intro", "nodes": {}}, "non-empty 'nodes'"),
+        (_broken(start="missing"), "start node 'missing'"),
+        (_broken(start=["intro"]), "start node"),
+        (_broken(intro__on_invalid="nowhere"), "intro.on_invalid: unknown node 'nowhere'"),
+        (_broken(intro__on_timeout={"node": "goodbye"}), "intro.on_timeout: unknown node"),
+        (_broken(intro__retries=True), "intro.retries"),
+        (_broken(intro__retries=-1), "intro.retries"),
+        (_broken(intro__say=["a", "b"]), "intro.say must be a string"),
+        (_broken(intro__hangup=True), "gather nodes cannot also use"),
+        (_broken(intro__options={"1x": {"next": "goodbye"}}), "invalid digits"),
+        (
+            _broken(intro__options={"1": {"next": "goodbye", "actions": {"type": "dnc"}}}),
+            "must be a list",
+        ),
+        (
+            _broken(intro__options={"1": {"next": "goodbye", "actions": [{"type": "sms"}]}}),
+            "unknown action",
+        ),
+        (
+            _broken(intro__options={"1": {"next": "goodbye", "actions": [{"type": "consent"}]}}),
+            "needs 'action'",
+        ),
+        (_broken(connect__hangup=True), "needs exactly one of"),
+        (_broken(goodbye__colour="red"), "unknown keys"),
+        (
+            _broken(intro__gather={"num_digits": "1"}),
+            "intro.gather.num_digits must be a positive integer",
+        ),
+        (_broken(intro__gather={"num_digits": 0}), "intro.gather.num_digits"),
+        (_broken(intro__gather={"timeout": 2.5}), "intro.gather.timeout must be a positive integer"),
+        (_broken(intro__gather={"timeout": True}), "intro.gather.timeout"),
+        (_broken(intro__gather={"finish_on_key": "#"}), "intro.gather: unknown keys"),
+        (_broken(intro__options={"12": {"next": "goodbye"}}), "longer than gather.num_digits"),
+    ],
+)
+def test_validation_errors(definition, message):
+    with pytest.raises(FlowError, match=message):
+        validate(definition)
+
+
+def test_multi_digit_options_fit_num_digits():
+    flow = _broken(
+        intro__gather={"num_digits": 2},
+        intro__options={"1": {"next": "goodbye"}, "12": {"next": "connect"}},
+    )
+    validate(flow)
+
+
+def test_next_cycles_are_rejected():
+    flow = copy.deepcopy(FLOW)
+    flow["nodes"]["a"] = {"say": "A", "next": "b"}
+    flow["nodes"]["b"] = {"say": "B", "next": "c"}
+    flow["nodes"]["c"] = {"say": "C", "next": "a"}
+    flow["nodes"]["d"] = {"say": "D", "next": "d"}
+    flow["nodes"]["e"] = {"say": "E", "next": "a"}
+    with pytest.raises(FlowError) as excinfo:
+        validate(flow)
+    message = str(excinfo.value)
+    assert "a -> b -> c -> a" in message
+    assert "d -> d" in message
+    # Each loop is reported once, however many nodes lead into it.
+    assert message.count("loop forever") == 2
+
+
+def test_next_chains_through_menus_are_allowed():
+    flow = copy.deepcopy(FLOW)
+    # goodbye -> intro is fine: intro waits for input before going anywhere.
+    flow["nodes"]["goodbye"] = {"say": "Uudestaan.", "next": "intro"}
+    validate(flow)
+
+
+def test_validation_reports_every_problem():
+    with pytest.raises(FlowError) as excinfo:
+        validate(_broken(start="missing", intro__on_invalid="nowhere"))
+    assert "start node" in str(excinfo.value) and "intro.on_invalid" in str(excinfo.value)
+
+
+def test_load_definition_wraps_parse_errors(tmp_path):
+    path = tmp_path / "flow.json"
+    path.write_text("{not json")
+    with pytest.raises(FlowError, match="Invalid JSON"):
+        load_definition(path)
+
+
+def test_load_definition_wraps_yaml_errors(tmp_path):
+    pytest.importorskip("yaml")
+    path = tmp_path / "flow.yaml"
+    path.write_text("start: [unclosed\n")
+    with pytest.raises(FlowError, match="Invalid YAML"):
+        load_definition(path)
+
+
+def _write(path, content: str, mtime_ns: int) -> None:
+    path.write_text(content)
+    # Explicit mtimes so the test does not depend on filesystem resolution.
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.mark.parametrize(
+    "bad_content",
+    [
+        "{not json",
+        json.dumps(_broken(intro__on_invalid="nowhere")),
+        json.dumps(_broken(intro__on_timeout=["goodbye"])),
+        json.dumps(["not", "a", "mapping"]),
+    ],
+)
+def test_hot_reload_keeps_previous_flow_on_bad_edit(tmp_path, bad_content):
+    path = tmp_path / "flow.json"
+    _write(path, json.dumps(FLOW), 1_000_000_000)
+    manager = FlowManager(path, check_interval=0)
+    original = manager.current()
+
+    _write(path, bad_content, 2_000_000_000)
+    assert manager.current() is original
+
+    fixed = _broken(goodbye__say="Näkemiin.")
+    _write(path, json.dumps(fixed), 3_000_000_000)
+    reloaded = manager.current()
+    assert reloaded.version != original.version
+    # Calls that started on the old version can still finish on it.
+    assert manager.get(original.version) is original
+
+
+def test_hot_reload_survives_missing_file(tmp_path):
+    path = tmp_path / "flow.json"
+    _write(path, json.dumps(FLOW), 1_000_000_000)
+    manager = FlowManager(path, check_interval=0)
+    original = manager.current()
+    path.unlink()
+    assert manager.current() is original
+
+
+def test_first_load_must_be_valid(tmp_path):
+    path = tmp_path / "flow.json"
+    path.write_text("{not json")
+    with pytest.raises(FlowError):
+        FlowManager(path, check_interval=0).current()
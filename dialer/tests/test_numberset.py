@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import pytest
+
+from dialer import numberset
+from dialer.numberset import CombinedNumberSet, NumberSet, _sorted_unique, to_int, to_str
+
+
+def test_e164_encoding_round_trip():
+    assert to_str(to_int("+358401234567")) == "+358401234567"
+    for bad in ("0401234567", "+0401234567", "+35840abc", "+" + "1" * 16, ""):
+        with pytest.raises(ValueError):
+            to_int(bad)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    numbers = ["+358401234567", "+14155550100", "+358401234567", "+4420700000"]
+    original = NumberSet.from_numbers(numbers)
+    path = tmp_path / "dnc.bin"
+    original.save(path)
+    loaded = NumberSet.load(path)
+    assert len(loaded) == 3
+    assert list(loaded) == list(original) == sorted(set(numbers), key=to_int)
+    assert "+14155550100" in loaded and "+14155550101" not in loaded
+
+
+def test_empty_set_round_trip(tmp_path):
+    path = tmp_path / "empty.bin"
+    NumberSet().save(path)
+    loaded = NumberSet.load(path)
+    assert len(loaded) == 0
+    assert loaded.contains_many(["+358401234567"]) == [False]
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / "numbers.txt"
+    path.write_text("+358401234567\n")
+    with pytest.raises(ValueError):
+        NumberSet.load(path)
+
+
+def test_contains_many_matches_contains():
+    stored = NumberSet.from_numbers(["+358401234567", "+358401234569", "+999999999999999"])
+    queries = ["+358401234567", "+358401234568", "+999999999999999", "+1", "not a number", ""]
+    assert stored.contains_many(queries) == [query in stored for query in queries]
+    assert stored.contains_many(queries) == [True, False, True, False, False, False]
+
+
+def test_combined_set_checks_every_part():
+    combined = CombinedNumberSet(
+        NumberSet.from_numbers(["+358401234567"]),
+        NumberSet.from_numbers(["+14155550100"]),
+    )
+    flags = combined.contains_many(["+358401234567", "+14155550100", "+358400000000"])
+    assert flags == [True, True, False]
+    assert "+14155550100" in combined
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        [],
+        [5, 3, 5, 1, 3],
+        list(range(20)),  # already ordered: runs are concatenated
+        [7] * 10,
+        [9, 1, 8, 2, 7, 3, 6, 4, 5, 0, 9, 1, 10**14],
+    ],
+)
+def test_sorted_unique_across_runs(values):
+    assert list(_sorted_unique(values, chunk=3)) == sorted(set(values))
+    assert list(_sorted_unique(iter(values))) == sorted(set(values))
+
+
+def test_from_ints_without_numpy(monkeypatch):
+    monkeypatch.setattr(numberset, "_np", None)
+    numbers = ["+358401234569", "+358401234567", "bad", "+358401234567"]
+    stored = NumberSet.from_numbers(numbers, strict=False)
+    assert list(stored) == ["+358401234567", "+358401234569"]
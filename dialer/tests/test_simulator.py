@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from dialer.calls import DialerRunner
+from dialer.config import settings
+from dialer.simulator import SimulatedClient, VirtualClock
+
+NUMBERS = [f"+35850{index:07d}" for index in range(5)]
+
+
+def _rows(path, sql: str) -> list:
+    with sqlite3.connect(path) as conn:
+        return conn.execute(sql).fetchall()
+
+
+@pytest.fixture
+def client(tmp_path, restore_storage):
+    def make(speed: float = 0.0, seed: int = 1) -> SimulatedClient:
+        return SimulatedClient(clock=VirtualClock(speed=speed), seed=seed, data_dir=tmp_path / "sim")
+
+    return make
+
+
+def test_stop_interrupts_real_time_interval(client):
+    runner = DialerRunner(client(speed=1.0), interval=30)
+    stop = threading.Event()
+    thread = threading.Thread(target=lambda: runner.run(NUMBERS, should_stop=stop.is_set), daemon=True)
+    thread.start()
+    time.sleep(0.3)
+    started = time.monotonic()
+    stop.set()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert time.monotonic() - started < 1.0
+    assert runner.client.stats.placed == 1
+
+
+def test_seeded_run_writes_only_to_simulation_data_dir(client, tmp_path):
+    live_db = settings.sqlite_path
+    live_before = _rows(live_db, "SELECT COUNT(*) FROM call_events")[0][0]
+    sim = client(seed=7)
+    numbers = [f"+35850{index:07d}" for index in range(60)]
+    DialerRunner(sim, interval=60).run(numbers)
+
+    sim_db = tmp_path / "sim" / "logs.sqlite"
+    statuses = dict(_rows(sim_db, "SELECT event, COUNT(*) FROM call_events GROUP BY event"))
+    consents = dict(
+        _rows(sim_db, "SELECT action, COUNT(*) FROM consents WHERE source = 'ivr' GROUP BY action")
+    )
+    assert sim.stats.placed == 60
+    # One "initiated" row from the runner and one from the status webhook.
+    assert statuses.pop("initiated") == 120
+    for outcome, count in sim.stats.outcomes.items():
+        assert statuses[outcome] == count
+    assert consents.get("accepted", 0) == sim.stats.digits["1"]
+    assert consents.get("declined", 0) == sim.stats.digits["2"]
+    assert _rows(live_db, "SELECT COUNT(*) FROM call_events")[0][0] == live_before
+    assert (tmp_path / "sim" / "traces.sqlite").exists()
+
+    # Rows carry virtual time: an hour of dialing, not the test's wall time.
+    first, last = _rows(sim_db, "SELECT MIN(ts), MAX(ts) FROM call_events")[0]
+    span = datetime.fromisoformat(last) - datetime.fromisoformat(first)
+    assert span.total_seconds() > 59 * 60
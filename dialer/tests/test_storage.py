@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+
+def test_append_numbers_skips_known_and_repeated_numbers(isolated_storage):
+    isolated_storage.save_numbers(["+358401234567", "+358401234568"])
+    merged = isolated_storage.append_numbers(
+        ["+358401234568", "+358401234569", "+358401234569", "+358401234570"]
+    )
+    assert merged == ["+358401234567", "+358401234568", "+358401234569", "+358401234570"]
+    assert isolated_storage.list_numbers() == merged
+
+
+def test_dnc_index_follows_file_changes(isolated_storage):
+    isolated_storage.add_to_dnc("+358401234567")
+    isolated_storage.add_to_dnc("+358401234567")
+    assert isolated_storage.list_dnc() == ["+358401234567"]
+    allowed, blocked = isolated_storage.split_dnc(["+358401234567", "+358401234568"])
+    assert (allowed, blocked) == (["+358401234568"], ["+358401234567"])
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import json
+import time
+
+import pytest
+
+from dialer.tracing import SERVICE_NAME, Span, SpanStore, Tracer, to_otlp, trace_id
+
+
+def _span(store: SpanStore, call_sid: str, start_ns: int) -> None:
+    store.add(Span(call_sid=call_sid, name="test", start_ns=start_ns, end_ns=start_ns + 1))
+
+
+def test_prune_drops_spans_past_retention(tmp_path):
+    store = SpanStore(tmp_path / "traces.sqlite", retention_seconds=3600)
+    now = time.time_ns()
+    _span(store, "CAold", now - 2 * 3600 * 1_000_000_000)
+    _span(store, "CAnew", now)
+    store.flush()
+    assert store.prune() == 1
+    assert [row["call_sid"] for row in store.recent_calls()] == ["CAnew"]
+
+
+def test_prune_keeps_the_newest_rows_under_the_cap(tmp_path):
+    store = SpanStore(tmp_path / "traces.sqlite", max_spans=3)
+    now = time.time_ns()
+    for index in range(5):
+        _span(store, f"CA{index}", now + index)
+    store.flush()
+    assert store.prune() == 2
+    assert sorted(row["call_sid"] for row in store.recent_calls()) == ["CA2", "CA3", "CA4"]
+
+
+def test_prune_is_a_no_op_without_limits(tmp_path):
+    store = SpanStore(tmp_path / "traces.sqlite")
+    _span(store, "CA1", 0)
+    store.flush()
+    assert store.prune() == 0
+
+
+def _tracer(tmp_path, sample_rate: float = 1.0) -> Tracer:
+    return Tracer(SpanStore(tmp_path / "traces.sqlite"), sample_rate)
+
+
+def test_sampling_is_a_stable_hash_of_the_sid(tmp_path):
+    tracer = _tracer(tmp_path, 0.25)
+    sids = [f"CA{index:032x}" for index in range(4000)]
+    first = [tracer.sampled(sid) for sid in sids]
+    assert first == [_tracer(tmp_path, 0.25).sampled(sid) for sid in sids]
+    assert 0.2 < sum(first) / len(sids) < 0.3
+    # Raising the rate only adds calls; everything sampled before stays in.
+    wider = _tracer(tmp_path, 0.5)
+    assert all(wider.sampled(sid) for sid, kept in zip(sids, first) if kept)
+
+
+def test_sampling_edges(tmp_path):
+    assert not _tracer(tmp_path, 0.0).sampled("CA1")
+    assert _tracer(tmp_path, 1.0).sampled("CA1")
+    assert not _tracer(tmp_path, 1.0).sampled("")
+
+
+def test_unsampled_calls_record_nothing(tmp_path):
+    tracer = _tracer(tmp_path, 0.0)
+    with tracer.span("webhook.voice", "CA1") as span:
+        assert span is None
+    tracer.record("dial.place_call", "CA1", 0)
+    assert tracer.store.spans_for("CA1") == []
+
+
+def test_nested_spans_link_to_their_parent(tmp_path):
+    tracer = _tracer(tmp_path)
+    with tracer.span("webhook.gather", "CA1") as root:
+        with tracer.span("ivr.handle_selection") as child:
+            with tracer.span("storage.log_consent", action="accepted") as grandchild:
+                pass
+        tracer.record("dial.place_call", "CA1", tracer.clock_ns())
+        # A span for another call never adopts this call's parent.
+        with tracer.span("webhook.status", "CA2") as other:
+            pass
+    # Helpers outside any trace create no span at all.
+    with tracer.span("storage.log_consent") as orphan:
+        assert orphan is None
+
+    spans = {span.name: span for span in tracer.store.spans_for("CA1")}
+    assert spans["webhook.gather"].parent_id is None
+    assert spans["ivr.handle_selection"].parent_id == root.span_id
+    assert spans["storage.log_consent"].parent_id == child.span_id
+    assert spans["storage.log_consent"].attributes == {"action": "accepted"}
+    assert spans["dial.place_call"].parent_id == root.span_id
+    assert grandchild.end_ns >= grandchild.start_ns
+    assert tracer.store.spans_for("CA2")[0].parent_id is None
+    assert other.call_sid == "CA2"
+
+
+def test_failed_spans_record_the_error(tmp_path):
+    tracer = _tracer(tmp_path)
+    with pytest.raises(RuntimeError):
+        with tracer.span("webhook.voice", "CA1"):
+            raise RuntimeError("boom")
+    (span,) = tracer.store.spans_for("CA1")
+    assert "boom" in span.attributes["error"]
+
+
+def test_otlp_export_shape(tmp_path):
+    tracer = _tracer(tmp_path)
+    with tracer.span("webhook.gather", "CA1", digits="1", attempt=2, ok=True, ratio=0.5):
+        with tracer.span("ivr.handle_selection"):
+            pass
+    spans = tracer.store.spans_for("CA1")
+    payload = to_otlp("CA1", spans)
+
+    (resource,) = payload["resourceSpans"]
+    assert resource["resource"]["attributes"] == [
+        {"key": "service.name", "value": {"stringValue": SERVICE_NAME}}
+    ]
+    (scope,) = resource["scopeSpans"]
+    exported = scope["spans"]
+    assert len(exported) == 2
+    assert {span["traceId"] for span in exported} == {trace_id("CA1")}
+    assert len(trace_id("CA1")) == 32
+    root, child = exported
+    assert root["parentSpanId"] == "" and child["parentSpanId"] == root["spanId"]
+    assert len(root["spanId"]) == 16
+    assert int(root["endTimeUnixNano"]) >= int(root["startTimeUnixNano"])
+    attributes = {item["key"]: item["value"] for item in root["attributes"]}
+    assert attributes == {
+        "call.sid": {"stringValue": "CA1"},
+        "digits": {"stringValue": "1"},
+        "attempt": {"intValue": "2"},
+        "ok": {"boolValue": True},
+        "ratio": {"doubleValue": 0.5},
+    }
+    json.dumps(payload)
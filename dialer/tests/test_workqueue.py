@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from dialer.workqueue import DONE, LeaseKeeper, RedisQueueBackend, SQLiteQueueBackend
+
+CAMPAIGN = "test"
+NUMBERS = [f"+35840{index:07d}" for index in range(50)]
+
+
+def _redis_backend() -> RedisQueueBackend:
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")  # fakeredis needs it for EVAL
+    return RedisQueueBackend(fakeredis.FakeRedis(decode_responses=True))
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        queue = SQLiteQueueBackend(tmp_path / "queue.sqlite")
+    else:
+        queue = _redis_backend()
+    queue.enqueue(CAMPAIGN, NUMBERS)
+    return queue
+
+
+def test_enqueue_is_idempotent(backend):
+    assert backend.enqueue(CAMPAIGN, NUMBERS[:10] + ["+358409999999"]) == 1
+    assert backend.counts(CAMPAIGN)["pending"] == len(NUMBERS) + 1
+
+
+def test_workers_never_claim_the_same_item(backend):
+    first = backend.claim(CAMPAIGN, "a", 20, 60)
+    second = backend.claim(CAMPAIGN, "b", 20, 60)
+    assert len(first) == len(second) == 20
+    assert not {lease.number for lease in first} & {lease.number for lease in second}
+    # Only the holder may extend or finish a lease.
+    assert backend.heartbeat(CAMPAIGN, "b", [first[0].item_id], 60) == []
+    assert not backend.complete(CAMPAIGN, "b", first[0].item_id, DONE)
+    assert backend.complete(CAMPAIGN, "a", first[0].item_id, DONE)
+
+
+def test_concurrent_claims_are_disjoint(backend):
+    claimed: list[str] = []
+    lock = threading.Lock()
+
+    def worker(name: str) -> None:
+        while True:
+            leases = backend.claim(CAMPAIGN, name, 3, 60)
+            if not leases:
+                return
+            with lock:
+                claimed.extend(lease.number for lease in leases)
+
+    threads = [threading.Thread(target=worker, args=(f"w{index}",)) for index in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == sorted(NUMBERS)
+
+
+def test_expired_lease_is_reclaimed(backend):
+    stale = backend.claim(CAMPAIGN, "crashed", 5, 0.01)
+    time.sleep(0.05)
+    assert backend.reclaim_expired(CAMPAIGN) == 5
+    retaken = backend.claim(CAMPAIGN, "b", len(NUMBERS), 60)
+    assert {lease.number for lease in stale} <= {lease.number for lease in retaken}
+    # The crashed worker has lost its leases for good.
+    assert backend.heartbeat(CAMPAIGN, "crashed", [lease.item_id for lease in stale], 60) == []
+    assert not backend.complete(CAMPAIGN, "crashed", stale[0].item_id, DONE)
+
+
+def test_claim_takes_over_expired_leases(backend):
+    stale = backend.claim(CAMPAIGN, "crashed", len(NUMBERS), 0.01)
+    time.sleep(0.05)
+    retaken = backend.claim(CAMPAIGN, "b", len(NUMBERS), 60)
+    assert sorted(lease.number for lease in retaken) == sorted(lease.number for lease in stale)
+
+
+def test_release_returns_items_to_pending(backend):
+    leases = backend.claim(CAMPAIGN, "a", 5, 60)
+    assert backend.release(CAMPAIGN, "b", [lease.item_id for lease in leases]) == 0
+    assert backend.release(CAMPAIGN, "a", [lease.item_id for lease in leases]) == 5
+    assert backend.counts(CAMPAIGN).get("pending") == len(NUMBERS)
+
+
+def test_keeper_stops_holding_a_lease_once_it_expires(backend):
+    keeper = LeaseKeeper(backend, CAMPAIGN, "stalled", batch=2, lease_seconds=0.05)
+    leases = keeper.claim()
+    assert all(keeper.holds(lease) for lease in leases)
+    # No heartbeat ran (the node stalled), so the leases may now be reclaimed elsewhere.
+    time.sleep(0.1)
+    assert not any(keeper.holds(lease) for lease in leases)
+
+
+def test_keeper_heartbeat_extends_local_expiry(backend):
+    keeper = LeaseKeeper(backend, CAMPAIGN, "a", batch=2, lease_seconds=0.2)
+    leases = keeper.claim()
+    time.sleep(0.1)
+    keeper.heartbeat()
+    time.sleep(0.15)
+    assert all(keeper.holds(lease) for lease in leases)
+
+
+def test_keeper_drops_leases_reclaimed_by_another_node(backend):
+    keeper = LeaseKeeper(backend, CAMPAIGN, "a", batch=2, lease_seconds=0.05)
+    leases = keeper.claim()
+    time.sleep(0.1)
+    assert backend.claim(CAMPAIGN, "b", len(NUMBERS), 60)
+    keeper.heartbeat()
+    assert not any(keeper.holds(lease) for lease in leases)
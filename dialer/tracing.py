@@ -0,0 +1,380 @@
+"""Sampled per-call tracing across dialing, webhooks, IVR and storage.
+
+Every span belongs to a call and is keyed by its ``call_sid``, so the
+stages that run in different processes and requests (``DialerRunner`` in the
+TUI or web controller, the Twilio webhooks, ``ivr.handle_selection`` and the
+SQLite writes beneath them) line up on one timeline. The sampling decision is
+a stable hash of the SID, which keeps every stage of a call either in or out
+of the trace without passing any state around.
+
+Finished spans are buffered in memory and written in batches by a daemon
+thread to a separate SQLite file so tracing never contends with the audit
+log. The same thread prunes spans older than ``TRACE_RETENTION_DAYS`` and
+beyond ``TRACE_MAX_SPANS`` rows. ``python -m dialer.tracing export`` writes
+OTLP/JSON files per call.
+"""
+from __future__ import annotations
+
+import argparse
+import atexit
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List
+
+from .config import settings
+
+SERVICE_NAME = "harjun-dialer"
+
+
+@dataclass
+class Span:
+    call_sid: str
+    name: str
+    start_ns: int
+    end_ns: int = 0
+    span_id: str = field(default_factory=lambda: os.urandom(8).hex())
+    parent_id: str | None = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+
+_current: contextvars.ContextVar[Span | None] = contextvars.ContextVar(
+    "dialer_current_span", default=None
+)
+
+
+def trace_id(call_sid: str) -> str:
+    """Return the 16-byte hex OTLP trace id derived from a call SID."""
+
+    return hashlib.blake2b(call_sid.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class SpanStore:
+    """Batched SQLite sink for finished spans."""
+
+    def __init__(
+        self,
+        db_path: Path,
+        batch_size: int = 64,
+        flush_interval: float = 1.0,
+        retention_seconds: float | None = None,
+        max_spans: int | None = None,
+        prune_interval: float = 60.0,
+    ) -> None:
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_seconds = retention_seconds
+        self.max_spans = max_spans
+        self.prune_interval = prune_interval
+        self._buffer: List[Span] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._ensure_database()
+        atexit.register(self.flush)
+
+    def relocate(self, db_path: Path) -> None:
+        """Write future spans to ``db_path``; buffered ones are flushed first."""
+
+        self.flush()
+        with self._lock:
+            self.db_path = db_path
+            self._ensure_database()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self._buffer.append(span)
+            full = len(self._buffer) >= self.batch_size
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._flush_loop, name="span-flusher", daemon=True
+                )
+                self._thread.start()
+        if full:
+            self._wake.set()
+
+    def flush(self) -> None:
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        rows = [
+            (
+                span.call_sid,
+                span.span_id,
+                span.parent_id,
+                span.name,
+                span.start_ns,
+                span.end_ns,
+                json.dumps(span.attributes, ensure_ascii=False, default=str),
+            )
+            for span in batch
+        ]
+        with self._connect() as conn:
+            conn.executemany(
+                """
+                INSERT INTO spans(call_sid, span_id, parent_id, name, start_ns, end_ns, attributes_json)
+                VALUES(?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows,
+            )
+            conn.commit()
+
+    def prune(self) -> int:
+        """Delete spans past the retention window or the row cap."""
+
+        deleted = 0
+        with self._connect() as conn:
+            if self.retention_seconds:
+                cutoff = time.time_ns() - int(self.retention_seconds * 1_000_000_000)
+                deleted += conn.execute("DELETE FROM spans WHERE start_ns < ?", (cutoff,)).rowcount
+            if self.max_spans:
+                # Ids only grow, so this keeps the newest max_spans rows.
+                deleted += conn.execute(
+                    "DELETE FROM spans WHERE id <= (SELECT MAX(id) FROM spans) - ?",
+                    (self.max_spans,),
+                ).rowcount
+            conn.commit()
+        return deleted
+
+    def spans_for(self, call_sid: str) -> List[Span]:
+        self.flush()
+        with self._connect() as conn:
+            rows = conn.execute(
+                """
+                SELECT call_sid, span_id, parent_id, name, start_ns, end_ns, attributes_json
+                FROM spans WHERE call_sid = ? ORDER BY start_ns, id
+                """,
+                (call_sid,),
+            ).fetchall()
+        return [
+            Span(
+                call_sid=row["call_sid"],
+                span_id=row["span_id"],
+                parent_id=row["parent_id"],
+                name=row["name"],
+                start_ns=row["start_ns"],
+                end_ns=row["end_ns"],
+                attributes=json.loads(row["attributes_json"] or "{}"),
+            )
+            for row in rows
+        ]
+
+    def recent_calls(self, limit: int = 50) -> List[sqlite3.Row]:
+        self.flush()
+        with self._connect() as conn:
+            return conn.execute(
+                """
+                SELECT call_sid, MIN(start_ns) AS start_ns, MAX(end_ns) AS end_ns,
+                       COUNT(*) AS span_count
+                FROM spans GROUP BY call_sid ORDER BY start_ns DESC LIMIT ?
+                """,
+                (limit,),
+            ).fetchall()
+
+    def _flush_loop(self) -> None:
+        next_prune = time.monotonic()
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                if time.monotonic() >= next_prune:
+                    next_prune = time.monotonic() + self.prune_interval
+                    self.prune()
+            except sqlite3.Error:  # pragma: no cover - tracing must never break calls
+                pass
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _ensure_database(self) -> None:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS spans (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    call_sid TEXT,
+                    span_id TEXT,
+                    parent_id TEXT,
+                    name TEXT,
+                    start_ns INTEGER,
+                    end_ns INTEGER,
+                    attributes_json TEXT
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_spans_call_sid ON spans(call_sid)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_spans_start_ns ON spans(start_ns)")
+            conn.commit()
+
+
+class Tracer:
+    """Creates spans for sampled calls and hands them to a ``SpanStore``."""
+
+    def __init__(self, store: SpanStore, sample_rate: float = 1.0) -> None:
+        self.store = store
+        self.sample_rate = sample_rate
+        # Source of span timestamps; the simulator swaps in its virtual clock.
+        self.clock_ns: Callable[[], int] = time.time_ns
+
+    def sampled(self, call_sid: str) -> bool:
+        if not call_sid or self.sample_rate <= 0:
+            return False
+        if self.sample_rate >= 1:
+            return True
+        bucket = int.from_bytes(hashlib.blake2b(call_sid.encode("utf-8"), digest_size=8).digest(), "big")
+        return bucket < self.sample_rate * 2**64
+
+    @contextmanager
+    def span(self, name: str, call_sid: str | None = None, **attributes: Any) -> Iterator[Span | None]:
+        """Time a block as a child of the current span.
+
+        Without ``call_sid`` the span only exists inside an active trace, so
+        shared helpers such as storage writes cost a context lookup otherwise.
+        """
+
+        parent = _current.get()
+        sid = call_sid or (parent.call_sid if parent else None)
+        if not sid or not self.sampled(sid):
+            yield None
+            return
+        span = Span(
+            call_sid=sid,
+            name=name,
+            start_ns=self.clock_ns(),
+            parent_id=parent.span_id if parent and parent.call_sid == sid else None,
+            attributes=attributes,
+        )
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.set("error", repr(exc))
+            raise
+        finally:
+            _current.reset(token)
+            span.end_ns = self.clock_ns()
+            self.store.add(span)
+
+    def record(
+        self, name: str, call_sid: str, start_ns: int, end_ns: int | None = None, **attributes: Any
+    ) -> None:
+        """Record an already-timed span, e.g. one whose SID was only known afterwards."""
+
+        if not self.sampled(call_sid):
+            return
+        parent = _current.get()
+        self.store.add(
+            Span(
+                call_sid=call_sid,
+                name=name,
+                start_ns=start_ns,
+                end_ns=end_ns if end_ns is not None else self.clock_ns(),
+                parent_id=parent.span_id if parent and parent.call_sid == call_sid else None,
+                attributes=attributes,
+            )
+        )
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(call_sid: str, spans: List[Span]) -> Dict[str, Any]:
+    """Return an OTLP/JSON ``ExportTraceServiceRequest`` for one call."""
+
+    tid = trace_id(call_sid)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "dialer.tracing"},
+                        "spans": [
+                            {
+                                "traceId": tid,
+                                "spanId": span.span_id,
+                                "parentSpanId": span.parent_id or "",
+                                "name": span.name,
+                                "kind": 1,
+                                "startTimeUnixNano": str(span.start_ns),
+                                "endTimeUnixNano": str(span.end_ns),
+                                "attributes": [
+                                    {"key": "call.sid", "value": {"stringValue": call_sid}},
+                                    *(
+                                        {"key": key, "value": _otlp_value(value)}
+                                        for key, value in span.attributes.items()
+                                    ),
+                                ],
+                            }
+                            for span in spans
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+store = SpanStore(
+    settings.trace_db_path,
+    retention_seconds=settings.trace_retention_days * 86400,
+    max_spans=settings.trace_max_spans,
+)
+tracer = Tracer(store, settings.trace_sample_rate)
+
+
+def main(argv: list[str] | None = None) -> int:  # pragma: no cover - CLI entrypoint
+    parser = argparse.ArgumentParser(description="Export recorded call traces as OTLP/JSON.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export")
+    export.add_argument("--out", default="traces", help="Output directory")
+    export.add_argument(
+        "--call-sid", action="append", help="Call SID (repeatable); default: recent calls"
+    )
+    export.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    call_sids = args.call_sid or [row["call_sid"] for row in store.recent_calls(args.limit)]
+    for call_sid in call_sids:
+        spans = store.spans_for(call_sid)
+        if not spans:
+            continue
+        path = out / f"{call_sid}.json"
+        path.write_text(json.dumps(to_otlp(call_sid, spans), indent=2), encoding="utf-8")
+        print(path)
+    return 0
+
+
+__all__ = ["Span", "SpanStore", "Tracer", "store", "to_otlp", "trace_id", "tracer"]
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""Telephony webhook handlers shared by the HTTP server and the simulator.
+
+``dialer.server`` exposes these as Twilio webhooks; the simulated backend
+calls them directly so dry runs exercise the same status, IVR and consent
+logic as real traffic.
+"""
+from __future__ import annotations
+
+from typing import Any, Mapping
+
+from .ivr import handle_selection, initial_prompt
+from .ivr_flow import handle_node
+from .storage import storage
+from .tracing import tracer
+
+
+def voice(call_sid: str) -> str:
+    """Return TwiML for an answered call."""
+
+    with tracer.span("webhook.voice", call_sid):
+        return initial_prompt()
+
+
+def gather(digits: str, caller: str, call_sid: str) -> str:
+    """Return TwiML for a keypress on the legacy ``/gather`` webhook."""
+
+    with tracer.span("webhook.gather", call_sid, digits=digits):
+        return handle_selection(digits, caller, call_sid)
+
+
+def ivr(
+    node: str,
+    version: str | None,
+    attempt: int,
+    is_input: bool,
+    digits: str,
+    caller: str,
+    call_sid: str,
+) -> str:
+    """Return TwiML for an IVR flow node or a gather result on it."""
+
+    with tracer.span("webhook.ivr", call_sid, node=node):
+        return handle_node(node, version, attempt, is_input, digits, caller, call_sid)
+
+
+def status(payload: Mapping[str, Any]) -> None:
+    """Log a call status callback."""
+
+    call_sid = payload.get("CallSid", "unknown")
+    number = payload.get("To", "")
+    event = payload.get("CallStatus", payload.get("CallEvent", "unknown"))
+    with tracer.span("webhook.status", call_sid, call_status=event):
+        storage.log_call_event(call_sid, number, event, dict(payload))
+
+
+def agent_status(payload: Mapping[str, Any]) -> None:
+    """Record the agent leg of a ``Dial`` on the parent call's trace."""
+
+    call_sid = payload.get("ParentCallSid") or payload.get("CallSid", "")
+    call_status = payload.get("CallStatus", "unknown")
+    now_ns = tracer.clock_ns()
+    start_ns = now_ns
+    duration = str(payload.get("CallDuration") or "")
+    if call_status == "completed" and duration.isdigit():
+        start_ns = now_ns - int(duration) * 1_000_000_000
+    tracer.record(
+        f"agent.{call_status}",
+        call_sid,
+        start_ns,
+        now_ns,
+        agent_call_sid=payload.get("CallSid", ""),
+    )
+
+
+__all__ = ["agent_status", "gather", "ivr", "status", "voice"]
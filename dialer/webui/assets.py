@@ -0,0 +1,241 @@
+"""Fingerprinted, precompressed static assets and HTML response compression.
+
+Files under ``webui/static`` are read once at startup. Each one is
+fingerprinted with a content hash (``main.css`` → ``main.1a2b3c4d5e.css``)
+and gets gzip and, when the ``brotli`` package is installed, brotli variants
+compressed at maximum level. Templates link assets through ``static_url()``,
+so a hashed URL changes whenever the file does and can be cached as
+immutable; plain names still work and are revalidated with an ETag. Each
+encoding is a different byte sequence and gets its own strong ETag
+(``"<hash>"``, ``"<hash>-gzip"``, ``"<hash>-br"``).
+
+:class:`HTMLCompressionMiddleware` gzips large ``text/html`` responses
+(dashboard pages and htmx partials) on the fly. Cached fragments arrive
+already gzipped by :func:`~dialer.webui.caching.cached_template` and pass
+through, as do streaming responses such as exports and everything that is
+not HTML.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mimetypes
+from dataclasses import dataclass, field
+from pathlib import Path, PurePosixPath
+from typing import Dict, MutableMapping
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+
+from ..admission import ASGIApp, Message, Receive, Scope, Send
+from .caching import MIN_COMPRESS_SIZE, accepted_encodings, not_modified
+
+try:  # optional, gzip is always available
+    import brotli as _brotli
+except ImportError:  # pragma: no cover - depends on environment
+    _brotli = None
+
+STATIC_DIR = Path(__file__).parent / "static"
+IMMUTABLE = "public, max-age=31536000, immutable"
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+
+@dataclass(frozen=True)
+class Asset:
+    name: str
+    hashed_name: str
+    media_type: str
+    digest: str
+    body: bytes
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+
+    def pick(self, accept_encoding: str) -> tuple[str | None, bytes]:
+        """Return the smallest variant the client accepts."""
+
+        accepted = accepted_encodings(accept_encoding)
+        for encoding in ("br", "gzip"):
+            if encoding in accepted and encoding in self.encoded:
+                return encoding, self.encoded[encoding]
+        return None, self.body
+
+    def etag(self, encoding: str | None) -> str:
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+
+def _compressible(media_type: str) -> bool:
+    return media_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def _compress(body: bytes) -> Dict[str, bytes]:
+    variants = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if _brotli is not None:
+        variants["br"] = _brotli.compress(body, quality=11)
+    # Only keep variants that actually save bytes.
+    return {name: data for name, data in variants.items() if len(data) < len(body)}
+
+
+def _hashed_name(relative: str, digest: str) -> str:
+    path = PurePosixPath(relative)
+    return str(path.with_name(f"{path.stem}.{digest}{path.suffix}"))
+
+
+class StaticAssets:
+    """In-memory manifest of the static directory, built at startup."""
+
+    def __init__(self, directory: Path, prefix: str = "/static") -> None:
+        self.directory = directory
+        self.prefix = prefix
+        self._by_name: Dict[str, Asset] = {}
+        self._by_hashed: Dict[str, Asset] = {}
+        self.build()
+
+    def build(self) -> None:
+        by_name: Dict[str, Asset] = {}
+        for path in sorted(self.directory.rglob("*")):
+            if not path.is_file() or path.name.startswith("."):
+                continue
+            relative = path.relative_to(self.directory).as_posix()
+            body = path.read_bytes()
+            digest = hashlib.sha256(body).hexdigest()[:10]
+            media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+            by_name[relative] = Asset(
+                name=relative,
+                hashed_name=_hashed_name(relative, digest),
+                media_type=media_type,
+                digest=digest,
+                body=body,
+                encoded=_compress(body)
+                if _compressible(media_type) and len(body) >= MIN_COMPRESS_SIZE
+                else {},
+            )
+        self._by_name = by_name
+        self._by_hashed = {asset.hashed_name: asset for asset in by_name.values()}
+
+    def url(self, name: str) -> str:
+        """Return the fingerprinted URL for ``name`` (Jinja ``static_url``)."""
+
+        asset = self._by_name.get(name)
+        return f"{self.prefix}/{asset.hashed_name if asset else name}"
+
+    def response(self, request: Request, path: str) -> Response:
+        asset = self._by_hashed.get(path)
+        immutable = asset is not None
+        if asset is None:
+            asset = self._by_name.get(path)
+        if asset is None:
+            raise HTTPException(status_code=404)
+        encoding, body = asset.pick(request.headers.get("accept-encoding", ""))
+        headers = {
+            "ETag": asset.etag(encoding),
+            "Cache-Control": IMMUTABLE if immutable else "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if not_modified(request, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(body, media_type=asset.media_type, headers=headers)
+
+
+assets = StaticAssets(STATIC_DIR)
+router = APIRouter()
+
+
+@router.api_route("/static/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def static_file(request: Request, path: str) -> Response:
+    return assets.response(request, path)
+
+
+def static_url(name: str) -> str:
+    return assets.url(name)
+
+
+class HTMLCompressionMiddleware:
+    """Gzip complete ``text/html`` responses above ``minimum_size`` bytes."""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = MIN_COMPRESS_SIZE, level: int = 6) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._accepts_gzip(scope):
+            await self.app(scope, receive, send)
+            return
+
+        start: Message | None = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                if self._eligible(message):
+                    # Hold the start message until the body shows the size.
+                    start = message
+                    return
+                await send(message)
+                return
+            if start is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+            held, start = start, None
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                await send(held)
+                await send(message)
+                return
+            compressed = gzip.compress(body, compresslevel=self.level)
+            headers = [
+                (key, self._weaken(value) if key.lower() == b"etag" else value)
+                for key, value in held["headers"]
+                if key.lower() not in (b"content-length", b"vary")
+            ]
+            headers += [
+                (b"content-encoding", b"gzip"),
+                (b"content-length", str(len(compressed)).encode("ascii")),
+                (b"vary", self._vary(held)),
+            ]
+            await send({**held, "headers": headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _accepts_gzip(scope: Scope) -> bool:
+        for key, value in scope.get("headers", []):
+            if key == b"accept-encoding":
+                return "gzip" in accepted_encodings(value.decode("latin-1"))
+        return False
+
+    @staticmethod
+    def _eligible(message: MutableMapping) -> bool:
+        headers = {key.lower(): value for key, value in message.get("headers", [])}
+        return (
+            message.get("status", 200) == 200
+            and headers.get(b"content-type", b"").startswith(b"text/html")
+            and b"content-encoding" not in headers
+        )
+
+    @staticmethod
+    def _weaken(etag: bytes) -> bytes:
+        # The gzipped bytes differ from the original, so a strong validator
+        # no longer holds; a weak one still means "same page".
+        return etag if etag.startswith(b"W/") else b"W/" + etag
+
+    @staticmethod
+    def _vary(message: MutableMapping) -> bytes:
+        existing = [
+            value for key, value in message.get("headers", []) if key.lower() == b"vary"
+        ]
+        if existing and b"accept-encoding" not in existing[0].lower():
+            return existing[0] + b", Accept-Encoding"
+        return existing[0] if existing else b"Accept-Encoding"
+
+
+__all__ = [
+    "Asset",
+    "HTMLCompressionMiddleware",
+    "StaticAssets",
+    "assets",
+    "router",
+    "static_url",
+]
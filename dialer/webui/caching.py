@@ -0,0 +1,190 @@
+"""Conditional GET support and a rendered-fragment cache for the Web UI."""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from fastapi import Request
+from fastapi.responses import HTMLResponse, Response
+
+# Version counters restart at zero in every process; mixing in a per-boot
+# nonce keeps a new process from reusing the previous one's ETags.
+BOOT_ID = os.urandom(8).hex()
+# Template files are re-stat'ed at most this often (seconds), like the IVR flow.
+TEMPLATE_CHECK_INTERVAL = 1.0
+# Below this size compression overhead outweighs the saved bytes.
+MIN_COMPRESS_SIZE = 1024
+
+
+@dataclass(frozen=True)
+class Fragment:
+    body: bytes
+    etag: str
+    last_modified: float
+    # Compressed once when the fragment is rendered, so cache hits serve it as is.
+    gzipped: bytes | None = None
+
+    def headers(self) -> Dict[str, str]:
+        return {
+            "ETag": self.etag,
+            "Last-Modified": formatdate(self.last_modified, usegmt=True),
+            # Let browsers keep the body but revalidate on every poll.
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+
+
+def accepted_encodings(header: str) -> set[str]:
+    encodings = set()
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+def make_etag(key: Hashable) -> str:
+    digest = hashlib.blake2b(repr(key).encode("utf-8"), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+class FragmentCache:
+    """Small LRU of rendered templates keyed on the data versions they show."""
+
+    def __init__(self, maxsize: int = 64) -> None:
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Tuple, Fragment]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple, render: Callable[[], str]) -> Fragment:
+        with self._lock:
+            fragment = self._entries.get(key)
+            if fragment is not None:
+                self._entries.move_to_end(key)
+                return fragment
+        body = render().encode("utf-8")
+        fragment = Fragment(
+            body=body,
+            etag=make_etag(key),
+            last_modified=time.time(),
+            gzipped=gzip.compress(body, compresslevel=6) if len(body) >= MIN_COMPRESS_SIZE else None,
+        )
+        with self._lock:
+            self._entries[key] = fragment
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return fragment
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_fingerprints: "weakref.WeakKeyDictionary[Any, Tuple[float, Tuple]]" = weakref.WeakKeyDictionary()
+_fingerprints_lock = threading.Lock()
+
+
+def template_fingerprint(env: Any) -> Tuple:
+    """Return a token that changes when any file the loader serves changes.
+
+    Covers ``{% extends %}``/``{% include %}`` parents too. The directory is
+    scanned at most once per ``TEMPLATE_CHECK_INTERVAL``, so an edit shows up
+    within that interval and polling requests in between cost nothing.
+    """
+
+    now = time.monotonic()
+    with _fingerprints_lock:
+        cached = _fingerprints.get(env)
+    if cached is not None and now - cached[0] < TEMPLATE_CHECK_INTERVAL:
+        return cached[1]
+    searchpath = getattr(env.loader, "searchpath", None) or []
+    stamps = []
+    for directory in searchpath:
+        for entry in sorted(os.scandir(directory), key=lambda entry: entry.name):
+            if entry.is_file():
+                stat = entry.stat()
+                stamps.append((entry.name, stat.st_mtime_ns, stat.st_size))
+    fingerprint = tuple(stamps)
+    with _fingerprints_lock:
+        _fingerprints[env] = (now, fingerprint)
+    return fingerprint
+
+
+def not_modified(request: Request, etag: str, last_modified: float | None = None) -> bool:
+    """Evaluate ``If-None-Match``/``If-Modified-Since`` per RFC 9110."""
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison: W/ prefixes are ignored on both sides.
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in candidates or etag.removeprefix("W/") in candidates
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(last_modified) <= since
+    return False
+
+
+def cached_template(
+    request: Request,
+    cache: FragmentCache,
+    env: Any,
+    template_name: str,
+    versions: Tuple,
+    context: Callable[[], Dict[str, Any]],
+) -> Response:
+    """Serve ``template_name`` with validators, rendering only on a cache miss.
+
+    ``versions`` must change whenever anything ``context`` reads changes; the
+    context factory is only called when the fragment actually needs a render.
+    The boot id and template files are part of the key as well.
+    """
+
+    key = (BOOT_ID, template_name, template_fingerprint(env), *versions)
+    etag = make_etag(key)
+    if request.headers.get("if-none-match") and not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    fragment = cache.get(key, lambda: env.get_template(template_name).render(context()))
+    headers = fragment.headers()
+    if not_modified(request, fragment.etag, fragment.last_modified):
+        return Response(status_code=304, headers=headers)
+    if fragment.gzipped is not None and "gzip" in accepted_encodings(
+        request.headers.get("accept-encoding", "")
+    ):
+        # Already compressed, so HTMLCompressionMiddleware passes it through.
+        headers["Content-Encoding"] = "gzip"
+        return HTMLResponse(fragment.gzipped, headers=headers)
+    return HTMLResponse(fragment.body, headers=headers)
+
+
+__all__ = [
+    "BOOT_ID",
+    "TEMPLATE_CHECK_INTERVAL",
+    "Fragment",
+    "FragmentCache",
+    "MIN_COMPRESS_SIZE",
+    "accepted_encodings",
+    "cached_template",
+    "make_etag",
+    "not_modified",
+    "template_fingerprint",
+]
@@ -1,27 +1,40 @@
 """FastAPI routes powering the dialer Web UI."""
 from __future__ import annotations
 
+import hashlib
 import threading
+from datetime import datetime, timezone
 from typing import Any, Dict, List
 
-from fastapi import APIRouter, Form, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import APIRouter, Form, Query, Request
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
 
 from ..calls import DialResult, DialerRunner
 from ..config import settings
+from ..exports import FORMATS, MEDIA_TYPES, stream_export
 from ..storage import storage
+from ..tracing import store as span_store
+from ..tracing import to_otlp
 from ..utils import normalize_number
+from ..workqueue import QueueBackend, get_backend, prepare_campaign
+from .assets import static_url
+from .caching import FragmentCache, cached_template
 
+# Routes that read storage, the span store or the queue are plain ``def`` so
+# FastAPI runs them in its threadpool; the event loop stays free for webhooks
+# while a page renders.
 router = APIRouter()
 _templates: Jinja2Templates | None = None
+_fragments = FragmentCache()
 
 
 def configure_templates(templates: Jinja2Templates) -> None:
     global _templates
     _templates = templates
     _templates.env.filters.setdefault("mask", mask)
+    _templates.env.globals.setdefault("static_url", static_url)
 
 
 class DialingState(BaseModel):
@@ -29,43 +42,77 @@ class DialingState(BaseModel):
     current_number: str | None = None
     current_status: str | None = None
     recent_results: List[Dict[str, Any]] = []
+    message: str | None = None
 
 
 class DialerController:
     def __init__(self) -> None:
         self._runner = DialerRunner()
+        self._queue: QueueBackend | None = None
         self._thread: threading.Thread | None = None
         self._stop = threading.Event()
         self.state = DialingState()
+        self.version = 0
         self._lock = threading.Lock()
 
     def start(self) -> bool:
         with self._lock:
             if self._thread and self._thread.is_alive():
-                return False
+                if self._stop.is_set():
+                    return self._refuse(
+                        "Edellinen soitto pysähtyy vielä, yritä hetken päästä uudelleen."
+                    )
+                return self._refuse("Sarjasoitto on jo käynnissä.")
             numbers = storage.list_numbers()
             if not numbers:
-                return False
+                return self._refuse("Numerolista on tyhjä.")
+            # Numbers go through the shared queue so other dialer nodes
+            # working the same campaign never call them twice.
+            if not prepare_campaign(self.queue, settings.campaign, numbers):
+                return self._refuse(
+                    f"Kampanja {settings.campaign} on jo soitettu. "
+                    "Tyhjennä numerolista aloittaaksesi alusta."
+                )
             self._stop.clear()
             self.state.running = True
             self.state.recent_results = []
-            self._thread = threading.Thread(target=self._run, args=(numbers,), daemon=True)
+            self.state.message = "Sarjasoitto käynnistetty."
+            self.version += 1
+            self._thread = threading.Thread(target=self._run, daemon=True)
             self._thread.start()
             return True
 
+    def _refuse(self, message: str) -> bool:
+        # Called with the lock held.
+        self.state.message = message
+        self.version += 1
+        return False
+
     def stop(self) -> None:
         self._stop.set()
         with self._lock:
+            if self.state.running:
+                self.state.message = "Sarjasoitto pysäytetty."
             self.state.running = False
             self.state.current_number = None
             self.state.current_status = None
+            self.version += 1
         thread = self._thread
         if thread and thread.is_alive() and thread is not threading.current_thread():
             thread.join(timeout=0.1)
         if not thread or not thread.is_alive():
             self._thread = None
 
-    def _run(self, numbers: list[str]) -> None:
+    @property
+    def queue(self) -> QueueBackend:
+        if self._queue is None:
+            self._queue = get_backend()
+        return self._queue
+
+    def reset_campaign(self) -> None:
+        self.queue.reset(settings.campaign)
+
+    def _run(self) -> None:
         def progress(result: DialResult) -> None:
             with self._lock:
                 self.state.current_number = result.number
@@ -73,18 +120,23 @@ class DialerController:
                 recent = list(self.state.recent_results)
                 recent.insert(0, result.__dict__)
                 self.state.recent_results = recent[:10]
+                self.version += 1
 
         try:
-            self._runner.run(
-                numbers,
+            self._runner.run_queue(
+                self.queue,
+                settings.campaign,
                 progress=progress,
                 should_stop=self._stop.is_set,
             )
         finally:
             with self._lock:
+                if not self._stop.is_set():
+                    self.state.message = f"Kampanja {settings.campaign} soitettu loppuun."
                 self.state.running = False
                 self.state.current_number = None
                 self.state.current_status = None
+                self.version += 1
             self._stop.set()
             self._thread = None
 
@@ -110,34 +162,57 @@ def get_templates() -> Jinja2Templates:
     return _templates
 
 
+# Settings are loaded once per process, so their fingerprint is fixed too.
+_SETTINGS_FINGERPRINT = hashlib.blake2b(settings.json().encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _cached(request: Request, template_name: str, versions: tuple, context) -> Response:
+    # Pages render settings directly, so they are part of every cache key.
+    versions = (*versions, _SETTINGS_FINGERPRINT)
+    return cached_template(
+        request, _fragments, get_templates().env, template_name, versions, context
+    )
+
+
 @router.get("/", response_class=HTMLResponse)
-async def dashboard(request: Request) -> HTMLResponse:
-    templates = get_templates()
-    state = controller.snapshot()
-    context = {
-        "request": request,
-        "state": state,
-        "numbers": storage.list_numbers(),
-        "dnc": storage.list_dnc(),
-        "events": storage.recent_events(),
-        "settings": settings,
-    }
-    return templates.TemplateResponse("index.html", context)
+def dashboard(request: Request) -> Response:
+    versions = (
+        storage.numbers_version(),
+        storage.dnc_version(),
+        storage.events_version(),
+        controller.version,
+    )
+
+    def context() -> Dict[str, Any]:
+        return {
+            "request": request,
+            "state": controller.snapshot(),
+            "numbers": storage.list_numbers(),
+            "dnc": storage.list_dnc(),
+            "dnc_index": storage.dnc_index(),
+            "events": storage.recent_events(),
+            "settings": settings,
+        }
+
+    return _cached(request, "index.html", versions, context)
 
 
 @router.get("/numbers", response_class=HTMLResponse)
-async def numbers_partial(request: Request) -> HTMLResponse:
-    templates = get_templates()
-    context = {
-        "request": request,
-        "numbers": storage.list_numbers(),
-        "dnc": storage.list_dnc(),
-    }
-    return templates.TemplateResponse("numbers.html", context)
+def numbers_partial(request: Request) -> Response:
+    versions = (storage.numbers_version(), storage.dnc_version())
+
+    def context() -> Dict[str, Any]:
+        return {
+            "request": request,
+            "numbers": storage.list_numbers(),
+            "dnc_index": storage.dnc_index(),
+        }
+
+    return _cached(request, "numbers.html", versions, context)
 
 
 @router.post("/numbers", response_class=HTMLResponse)
-async def add_number(request: Request, number: str = Form(...)) -> HTMLResponse:
+def add_number(request: Request, number: str = Form(...)) -> HTMLResponse:
     templates = get_templates()
     try:
         normalized = normalize_number(number)
@@ -148,25 +223,26 @@ async def add_number(request: Request, number: str = Form(...)) -> HTMLResponse:
     context = {
         "request": request,
         "numbers": storage.list_numbers(),
-        "dnc": storage.list_dnc(),
+        "dnc_index": storage.dnc_index(),
     }
     return templates.TemplateResponse("numbers.html", context)
 
 
 @router.post("/numbers/clear", response_class=HTMLResponse)
-async def clear_numbers(request: Request) -> HTMLResponse:
+def clear_numbers(request: Request) -> HTMLResponse:
     templates = get_templates()
     storage.clear_numbers()
+    controller.reset_campaign()
     context = {
         "request": request,
         "numbers": storage.list_numbers(),
-        "dnc": storage.list_dnc(),
+        "dnc_index": storage.dnc_index(),
     }
     return templates.TemplateResponse("numbers.html", context)
 
 
 @router.post("/dnc", response_class=HTMLResponse)
-async def add_dnc(request: Request, number: str = Form(...)) -> HTMLResponse:
+def add_dnc(request: Request, number: str = Form(...)) -> HTMLResponse:
     templates = get_templates()
     try:
         normalized = normalize_number(number)
@@ -183,23 +259,32 @@ async def add_dnc(request: Request, number: str = Form(...)) -> HTMLResponse:
 
 
 @router.get("/dialing", response_class=HTMLResponse)
-async def dialing_partial(request: Request) -> HTMLResponse:
-    templates = get_templates()
-    context = {"request": request, "state": controller.snapshot()}
-    return templates.TemplateResponse("dialing.html", context)
+def dialing_partial(request: Request) -> Response:
+    def context() -> Dict[str, Any]:
+        return {"request": request, "state": controller.snapshot()}
+
+    return _cached(request, "dialing.html", (controller.version,), context)
+
+
+def _dialing_response(request: Request, status: str) -> Response:
+    state = controller.snapshot()
+    if request.headers.get("hx-request"):
+        # The htmx buttons swap the dialing card, which shows the message.
+        return get_templates().TemplateResponse(
+            "dialing.html", {"request": request, "state": state}
+        )
+    return JSONResponse({"status": status, "message": state.message})
 
 
 @router.post("/dialing/start")
-async def start_dialing() -> JSONResponse:
-    if controller.start():
-        return JSONResponse({"status": "started"})
-    return JSONResponse({"status": "idle"})
+def start_dialing(request: Request) -> Response:
+    return _dialing_response(request, "started" if controller.start() else "idle")
 
 
 @router.post("/dialing/stop")
-async def stop_dialing() -> JSONResponse:
+def stop_dialing(request: Request) -> Response:
     controller.stop()
-    return JSONResponse({"status": "stopped"})
+    return _dialing_response(request, "stopped")
 
 
 @router.get("/dialing/status")
@@ -209,14 +294,100 @@ async def dialing_status() -> JSONResponse:
 
 
 @router.get("/settings", response_class=HTMLResponse)
-async def settings_partial(request: Request) -> HTMLResponse:
-    templates = get_templates()
-    context = {
-        "request": request,
-        "settings": settings,
-        "dnc": storage.list_dnc(),
-    }
-    return templates.TemplateResponse("settings.html", context)
+def settings_partial(request: Request) -> Response:
+    def context() -> Dict[str, Any]:
+        return {
+            "request": request,
+            "settings": settings,
+            "dnc": storage.list_dnc(),
+        }
+
+    return _cached(request, "settings.html", (storage.dnc_version(),), context)
+
+
+@router.get("/export/{table}")
+async def export_table(
+    table: str,
+    format: str = Query("csv"),  # noqa: A002 - public query parameter name
+    since: str | None = Query(None),
+    until: str | None = Query(None),
+    number: str | None = Query(None),
+    event: str | None = Query(None),
+) -> Response:
+    if format not in FORMATS:
+        return JSONResponse({"error": f"Unknown format: {format}"}, status_code=400)
+    try:
+        chunks = stream_export(
+            table, format, since=since, until=until, number=number, event=event
+        )
+    except ValueError as exc:
+        return JSONResponse({"error": str(exc)}, status_code=400)
+    filename = f"{table}.{format}"
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+def _timeline(spans: list) -> List[Dict[str, Any]]:
+    if not spans:
+        return []
+    t0 = min(span.start_ns for span in spans)
+    total = max(max(span.end_ns for span in spans) - t0, 1)
+    depth: Dict[str, int] = {}
+    rows = []
+    for span in spans:
+        depth[span.span_id] = depth.get(span.parent_id or "", -1) + 1
+        rows.append(
+            {
+                "name": span.name,
+                "depth": depth[span.span_id],
+                "offset_ms": (span.start_ns - t0) / 1e6,
+                "duration_ms": (span.end_ns - span.start_ns) / 1e6,
+                "left": round(100 * (span.start_ns - t0) / total, 2),
+                "width": round(100 * (span.end_ns - span.start_ns) / total, 2),
+                "attributes": span.attributes,
+            }
+        )
+    return rows
+
+
+def _traces_page(request: Request, call_sid: str | None) -> HTMLResponse:
+    calls = [
+        {
+            "call_sid": row["call_sid"],
+            "started": datetime.fromtimestamp(row["start_ns"] / 1e9, tz=timezone.utc)
+            .strftime("%Y-%m-%d %H:%M:%S"),
+            "duration_ms": (row["end_ns"] - row["start_ns"]) / 1e6,
+            "span_count": row["span_count"],
+        }
+        for row in span_store.recent_calls()
+    ]
+    spans = _timeline(span_store.spans_for(call_sid)) if call_sid else []
+    context = {"request": request, "calls": calls, "call_sid": call_sid, "spans": spans}
+    return get_templates().TemplateResponse("traces.html", context)
+
+
+@router.get("/traces", response_class=HTMLResponse)
+def traces(request: Request) -> HTMLResponse:
+    return _traces_page(request, None)
+
+
+@router.get("/traces/{call_sid}", response_class=HTMLResponse)
+def trace_detail(request: Request, call_sid: str) -> HTMLResponse:
+    return _traces_page(request, call_sid)
+
+
+@router.get("/traces/{call_sid}/otlp")
+def trace_otlp(call_sid: str) -> JSONResponse:
+    spans = span_store.spans_for(call_sid)
+    if not spans:
+        return JSONResponse({"error": "Trace not found"}, status_code=404)
+    return JSONResponse(
+        to_otlp(call_sid, spans),
+        headers={"Content-Disposition": f'attachment; filename="{call_sid}.json"'},
+    )
 
 
 __all__ = [
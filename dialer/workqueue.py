@@ -0,0 +1,557 @@
+"""Lease-based shared work queue for splitting a campaign across dialer nodes.
+
+Numbers are enqueued once per campaign. Each node claims a small batch with a
+lease that expires after ``lease_seconds``; while it works it heartbeats to
+extend the lease, marks each number done/failed, and releases what it did not
+get to. Leases of a node that crashed simply expire and are reclaimed by the
+next claim, so no number is dialed twice while its lease is live.
+
+Backends implement :class:`QueueBackend`. :class:`SQLiteQueueBackend` works
+for nodes sharing a filesystem; :class:`RedisQueueBackend` accepts any
+redis-py compatible client (a real server or a local stand-in).
+
+    python -m dialer.workqueue enqueue --campaign spring
+    python -m dialer.workqueue worker --campaign spring
+    python -m dialer.workqueue status --campaign spring
+"""
+from __future__ import annotations
+
+import argparse
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Protocol
+
+from .config import settings
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass(frozen=True)
+class Lease:
+    item_id: str
+    number: str
+    expires_at: float
+
+
+class QueueBackend(Protocol):
+    """Operations every shared queue backend must support atomically."""
+
+    def enqueue(self, campaign: str, numbers: Iterable[str]) -> int:  # pragma: no cover - interface only
+        """Add numbers not yet in the campaign; return how many were added."""
+
+    def claim(  # pragma: no cover
+        self, campaign: str, worker: str, batch: int, lease_seconds: float
+    ) -> List[Lease]:
+        """Lease up to ``batch`` pending or expired items to ``worker``."""
+
+    def heartbeat(  # pragma: no cover
+        self, campaign: str, worker: str, item_ids: Iterable[str], lease_seconds: float
+    ) -> List[str]:
+        """Extend leases still held by ``worker``; return the ids extended."""
+
+    def complete(self, campaign: str, worker: str, item_id: str, status: str) -> bool:  # pragma: no cover
+        """Mark a leased item ``done``/``failed`` if ``worker`` still holds it."""
+
+    def release(self, campaign: str, worker: str, item_ids: Iterable[str]) -> int:  # pragma: no cover
+        """Return leased items to the pending pool."""
+
+    def reclaim_expired(self, campaign: str) -> int:  # pragma: no cover
+        """Return items with expired leases to the pending pool."""
+
+    def reset(self, campaign: str) -> None:  # pragma: no cover
+        """Remove all items of a campaign."""
+
+    def counts(self, campaign: str) -> Dict[str, int]:  # pragma: no cover
+        """Return item counts per status."""
+
+
+class SQLiteQueueBackend:
+    """Queue stored in a SQLite table; claims run in ``BEGIN IMMEDIATE``."""
+
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = db_path
+        self._ensure_database()
+
+    def enqueue(self, campaign: str, numbers: Iterable[str]) -> int:
+        now = time.time()
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                """
+                INSERT OR IGNORE INTO work_items(campaign, number, status, updated_at)
+                VALUES(?, ?, 'pending', ?)
+                """,
+                ((campaign, number, now) for number in numbers),
+            )
+            return conn.total_changes - before
+
+    def claim(self, campaign: str, worker: str, batch: int, lease_seconds: float) -> List[Lease]:
+        now = time.time()
+        expires = now + lease_seconds
+        with self._transaction() as conn:
+            rows = conn.execute(
+                """
+                SELECT id, number FROM work_items
+                WHERE campaign = ?
+                  AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?))
+                ORDER BY id LIMIT ?
+                """,
+                (campaign, now, batch),
+            ).fetchall()
+            conn.executemany(
+                """
+                UPDATE work_items
+                SET status = 'leased', worker = ?, lease_expires = ?,
+                    attempts = attempts + 1, updated_at = ?
+                WHERE id = ?
+                """,
+                ((worker, expires, now, row["id"]) for row in rows),
+            )
+        return [Lease(str(row["id"]), row["number"], expires) for row in rows]
+
+    def heartbeat(
+        self, campaign: str, worker: str, item_ids: Iterable[str], lease_seconds: float
+    ) -> List[str]:
+        now = time.time()
+        extended = []
+        with self._transaction() as conn:
+            for item_id in item_ids:
+                cursor = conn.execute(
+                    """
+                    UPDATE work_items SET lease_expires = ?, updated_at = ?
+                    WHERE id = ? AND campaign = ? AND worker = ? AND status = 'leased'
+                    """,
+                    (now + lease_seconds, now, int(item_id), campaign, worker),
+                )
+                if cursor.rowcount:
+                    extended.append(item_id)
+        return extended
+
+    def complete(self, campaign: str, worker: str, item_id: str, status: str) -> bool:
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                """
+                UPDATE work_items SET status = ?, lease_expires = NULL, updated_at = ?
+                WHERE id = ? AND campaign = ? AND worker = ? AND status = 'leased'
+                """,
+                (status, time.time(), int(item_id), campaign, worker),
+            )
+            return cursor.rowcount == 1
+
+    def release(self, campaign: str, worker: str, item_ids: Iterable[str]) -> int:
+        with self._transaction() as conn:
+            cursor = conn.executemany(
+                """
+                UPDATE work_items
+                SET status = 'pending', worker = NULL, lease_expires = NULL, updated_at = ?
+                WHERE id = ? AND campaign = ? AND worker = ? AND status = 'leased'
+                """,
+                ((time.time(), int(item_id), campaign, worker) for item_id in item_ids),
+            )
+            return cursor.rowcount
+
+    def reclaim_expired(self, campaign: str) -> int:
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                """
+                UPDATE work_items
+                SET status = 'pending', worker = NULL, lease_expires = NULL, updated_at = ?
+                WHERE campaign = ? AND status = 'leased' AND lease_expires < ?
+                """,
+                (now, campaign, now),
+            )
+            return cursor.rowcount
+
+    def reset(self, campaign: str) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM work_items WHERE campaign = ?", (campaign,))
+
+    def counts(self, campaign: str) -> Dict[str, int]:
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) AS n FROM work_items WHERE campaign = ? GROUP BY status",
+                (campaign,),
+            ).fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connect()
+        try:
+            # IMMEDIATE takes the write lock up front so two nodes can never
+            # select the same pending rows.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def _ensure_database(self) -> None:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._transaction() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS work_items (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    campaign TEXT NOT NULL,
+                    number TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    worker TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL,
+                    UNIQUE(campaign, number)
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_work_items_claim ON work_items(campaign, status, id)"
+            )
+
+
+# Every Redis state transition runs as one Lua script so it is atomic on the
+# server: a node crashing mid-operation cannot drop an item, and ownership
+# checks cannot race with another node's reclaim or claim.
+# KEYS are always (members, pending, leases, owners, status).
+_REDIS_RECLAIM = """
+local function reclaim(now)
+  local expired = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', '(' .. now)
+  for _, number in ipairs(expired) do
+    redis.call('ZREM', KEYS[3], number)
+    redis.call('HDEL', KEYS[4], number)
+    redis.call('RPUSH', KEYS[2], number)
+  end
+  return #expired
+end
+"""
+
+_REDIS_SCRIPTS = {
+    # ARGV: numbers...
+    "enqueue": """
+local added = 0
+for _, number in ipairs(ARGV) do
+  if redis.call('SADD', KEYS[1], number) == 1 then
+    redis.call('RPUSH', KEYS[2], number)
+    added = added + 1
+  end
+end
+return added
+""",
+    # ARGV: worker, batch, now, expires
+    "claim": _REDIS_RECLAIM
+    + """
+reclaim(ARGV[3])
+local claimed = {}
+for _ = 1, tonumber(ARGV[2]) do
+  local number = redis.call('LPOP', KEYS[2])
+  if not number then break end
+  redis.call('ZADD', KEYS[3], ARGV[4], number)
+  redis.call('HSET', KEYS[4], number, ARGV[1])
+  claimed[#claimed + 1] = number
+end
+return claimed
+""",
+    # ARGV: worker, expires, numbers...
+    "heartbeat": """
+local extended = {}
+for i = 3, #ARGV do
+  local number = ARGV[i]
+  if redis.call('HGET', KEYS[4], number) == ARGV[1]
+      and redis.call('ZADD', KEYS[3], 'XX', 'CH', ARGV[2], number) == 1 then
+    extended[#extended + 1] = number
+  end
+end
+return extended
+""",
+    # ARGV: worker, number, status
+    "complete": """
+if redis.call('HGET', KEYS[4], ARGV[2]) ~= ARGV[1] then return 0 end
+if redis.call('ZREM', KEYS[3], ARGV[2]) == 0 then return 0 end
+redis.call('HDEL', KEYS[4], ARGV[2])
+redis.call('HSET', KEYS[5], ARGV[2], ARGV[3])
+return 1
+""",
+    # ARGV: worker, numbers...
+    "release": """
+local released = 0
+for i = 2, #ARGV do
+  local number = ARGV[i]
+  if redis.call('HGET', KEYS[4], number) == ARGV[1]
+      and redis.call('ZREM', KEYS[3], number) == 1 then
+    redis.call('HDEL', KEYS[4], number)
+    redis.call('LPUSH', KEYS[2], number)
+    released = released + 1
+  end
+end
+return released
+""",
+    # ARGV: now
+    "reclaim": _REDIS_RECLAIM + "\nreturn reclaim(ARGV[1])\n",
+}
+
+_REDIS_KEYS = ("members", "pending", "leases", "owners", "status")
+
+
+class RedisQueueBackend:
+    """Queue on a redis-py compatible client.
+
+    Keys per campaign: ``members`` (set of all numbers), ``pending`` (list),
+    ``leases`` (sorted set number → expiry), ``owners`` (hash number →
+    worker) and ``status`` (hash number → done/failed). Item ids are the
+    numbers themselves. Every transition is a server-side Lua script, so it
+    is atomic with respect to other nodes. The campaign is a hash tag, which
+    keeps all of a campaign's keys in one Redis Cluster slot.
+    """
+
+    enqueue_chunk = 1000
+
+    def __init__(self, client) -> None:
+        self.client = client
+        self._scripts = {name: client.register_script(source) for name, source in _REDIS_SCRIPTS.items()}
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisQueueBackend":
+        try:
+            import redis  # optional dependency, only needed for this backend
+        except ImportError as exc:  # pragma: no cover - depends on environment
+            raise RuntimeError("QUEUE_BACKEND=redis requires the redis package") from exc
+        return cls(redis.Redis.from_url(url, decode_responses=True))
+
+    def _key(self, campaign: str, name: str) -> str:
+        return f"dialer:queue:{{{campaign}}}:{name}"
+
+    def _run(self, script: str, campaign: str, *args):
+        keys = [self._key(campaign, name) for name in _REDIS_KEYS]
+        return self._scripts[script](keys=keys, args=list(args))
+
+    def enqueue(self, campaign: str, numbers: Iterable[str]) -> int:
+        numbers = list(numbers)
+        added = 0
+        for start in range(0, len(numbers), self.enqueue_chunk):
+            added += int(self._run("enqueue", campaign, *numbers[start:start + self.enqueue_chunk]))
+        return added
+
+    def claim(self, campaign: str, worker: str, batch: int, lease_seconds: float) -> List[Lease]:
+        now = time.time()
+        expires = now + lease_seconds
+        numbers = self._run("claim", campaign, worker, batch, repr(now), repr(expires))
+        return [Lease(_text(number), _text(number), expires) for number in numbers]
+
+    def heartbeat(
+        self, campaign: str, worker: str, item_ids: Iterable[str], lease_seconds: float
+    ) -> List[str]:
+        item_ids = list(item_ids)
+        if not item_ids:
+            return []
+        expires = time.time() + lease_seconds
+        extended = self._run("heartbeat", campaign, worker, repr(expires), *item_ids)
+        return [_text(number) for number in extended]
+
+    def complete(self, campaign: str, worker: str, item_id: str, status: str) -> bool:
+        return bool(self._run("complete", campaign, worker, item_id, status))
+
+    def release(self, campaign: str, worker: str, item_ids: Iterable[str]) -> int:
+        item_ids = list(item_ids)
+        if not item_ids:
+            return 0
+        return int(self._run("release", campaign, worker, *item_ids))
+
+    def reclaim_expired(self, campaign: str) -> int:
+        return int(self._run("reclaim", campaign, repr(time.time())))
+
+    def reset(self, campaign: str) -> None:
+        self.client.delete(*(self._key(campaign, name) for name in _REDIS_KEYS))
+
+    def counts(self, campaign: str) -> Dict[str, int]:
+        counts = {
+            PENDING: self.client.llen(self._key(campaign, "pending")),
+            LEASED: self.client.zcard(self._key(campaign, "leases")),
+        }
+        for status in self.client.hvals(self._key(campaign, "status")):
+            status = _text(status)
+            counts[status] = counts.get(status, 0) + 1
+        return {status: count for status, count in counts.items() if count}
+
+
+def _text(value) -> str:
+    # Clients created without decode_responses return bytes.
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def get_backend() -> QueueBackend:
+    if settings.queue_backend == "sqlite":
+        return SQLiteQueueBackend(settings.sqlite_path)
+    if settings.queue_backend == "redis":
+        return RedisQueueBackend.from_url(settings.redis_url)
+    raise ValueError(f"Unknown queue backend: {settings.queue_backend}")
+
+
+def prepare_campaign(backend: QueueBackend, campaign: str, numbers: Iterable[str]) -> int:
+    """Enqueue ``numbers`` and return how many items are still open."""
+
+    backend.enqueue(campaign, numbers)
+    counts = backend.counts(campaign)
+    return counts.get(PENDING, 0) + counts.get(LEASED, 0)
+
+
+def default_worker_id() -> str:
+    return settings.node_id or f"{socket.gethostname()}-{uuid.uuid4().hex[:6]}"
+
+
+class LeaseKeeper:
+    """Claims batches for one worker and heartbeats them in the background."""
+
+    def __init__(
+        self,
+        backend: QueueBackend,
+        campaign: str,
+        worker: str | None = None,
+        batch: int | None = None,
+        lease_seconds: float | None = None,
+    ) -> None:
+        self.backend = backend
+        self.campaign = campaign
+        self.worker = worker or default_worker_id()
+        self.batch = batch or settings.queue_claim_batch
+        self.lease_seconds = lease_seconds or settings.queue_lease_seconds
+        # item id -> local lease expiry, moved forward by each heartbeat.
+        self._held: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def __enter__(self) -> "LeaseKeeper":
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._heartbeat_loop, name="lease-heartbeat", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+        self.release_all()
+
+    def claim(self) -> List[Lease]:
+        leases = self.backend.claim(self.campaign, self.worker, self.batch, self.lease_seconds)
+        with self._lock:
+            for lease in leases:
+                self._held[lease.item_id] = lease.expires_at
+        return leases
+
+    def holds(self, lease: Lease) -> bool:
+        """Return whether ``lease`` is still ours and has not expired.
+
+        A node that stalls past its expiry (GC pause, suspended VM) may
+        already have lost the item to another node's reclaim, even though no
+        heartbeat has reported it yet.
+        """
+
+        with self._lock:
+            expires_at = self._held.get(lease.item_id)
+            if expires_at is None:
+                return False
+            if time.time() >= expires_at:
+                del self._held[lease.item_id]
+                return False
+            return True
+
+    def complete(self, lease: Lease, status: str = DONE) -> bool:
+        with self._lock:
+            self._held.pop(lease.item_id, None)
+        return self.backend.complete(self.campaign, self.worker, lease.item_id, status)
+
+    def release_all(self) -> None:
+        with self._lock:
+            item_ids, self._held = list(self._held), {}
+        if item_ids:
+            self.backend.release(self.campaign, self.worker, item_ids)
+
+    def heartbeat(self) -> None:
+        """Extend every held lease and forget the ones another node took."""
+
+        with self._lock:
+            item_ids = list(self._held)
+        if not item_ids:
+            return
+        # Taken before the call, so the local expiry never outlives the
+        # one the backend stored.
+        expires_at = time.time() + self.lease_seconds
+        extended = set(self.backend.heartbeat(self.campaign, self.worker, item_ids, self.lease_seconds))
+        with self._lock:
+            for item_id in item_ids:
+                if item_id not in self._held:
+                    continue
+                if item_id in extended:
+                    self._held[item_id] = expires_at
+                else:
+                    # Another node reclaimed this; never dial it from here.
+                    del self._held[item_id]
+
+    def _heartbeat_loop(self) -> None:
+        interval = max(self.lease_seconds / 3, 0.5)
+        while not self._stop.wait(interval):
+            self.heartbeat()
+
+
+def main(argv: list[str] | None = None) -> int:  # pragma: no cover - CLI entrypoint
+    from .calls import DialerRunner
+    from .storage import storage
+
+    parser = argparse.ArgumentParser(description="Shared dialing work queue.")
+    parser.add_argument("command", choices=["enqueue", "worker", "status", "reset"])
+    parser.add_argument("--campaign", default=settings.campaign)
+    parser.add_argument("--worker", help="Node id (default: DIALER_NODE_ID or hostname)")
+    args = parser.parse_args(argv)
+
+    backend = get_backend()
+    if args.command == "enqueue":
+        added = backend.enqueue(args.campaign, storage.list_numbers())
+        print(f"Enqueued {added} numbers into {args.campaign}.")
+    elif args.command == "worker":
+        def progress(result) -> None:
+            print(f"[{result.number}] {result.status}")
+
+        DialerRunner().run_queue(backend, args.campaign, worker=args.worker, progress=progress)
+    elif args.command == "status":
+        for status, count in sorted(backend.counts(args.campaign).items()):
+            print(f"{status:<8} {count}")
+    elif args.command == "reset":
+        backend.reset(args.campaign)
+        print(f"Campaign {args.campaign} cleared.")
+    return 0
+
+
+__all__ = [
+    "Lease",
+    "LeaseKeeper",
+    "QueueBackend",
+    "RedisQueueBackend",
+    "SQLiteQueueBackend",
+    "get_backend",
+    "prepare_campaign",
+]
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())